@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from config import config
 from flask_sqlalchemy import SQLAlchemy
@@ -5,6 +6,7 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from flask_mail import Mail
+from app.ratelimit import RateLimiter
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -13,14 +15,26 @@ login.login_view = 'auth.login'
 login.login_message = 'Please log in to access this page.'
 csrf = CSRFProtect()
 mail = Mail()
+limiter = RateLimiter()
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    if app.config.get('PROXY_FIX_HOPS'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    if app.config.get('JINJA_BYTECODE_CACHE_DIR'):
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = {**app.jinja_options,
+                             'bytecode_cache': FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])}
 
     db.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
+    # Registered before CSRF so throttled requests are rejected first
+    limiter.init_app(app)
     csrf.init_app(app)
     mail.init_app(app)
 
@@ -33,9 +47,16 @@ def create_app(config_name='default'):
     from app.admin import bp as admin_bp
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+
     from app import commands
     commands.init_app(app)
 
+    if app.config.get('JINJA_PRELOAD_TEMPLATES'):
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(name)
+
     return app
 
 from app import models
@@ -1,7 +1,8 @@
 from app.admin import bp
-from flask import render_template, request, current_app, url_for, flash, redirect
+from flask import render_template, request, current_app, url_for, flash, redirect, abort, jsonify
 from app.decorators import admin_required
-from app.models import User, Subscription, Plan
+from app.models import User, Subscription, Plan, Link
+from app.analytics import heavy_hitters
 from app import db
 from flask_login import login_required, current_user
 from datetime import datetime
@@ -99,4 +100,43 @@ def delete_user(user_id):
     db.session.delete(user)
     db.session.commit()
     flash(f'User {user.username} has been deleted.', 'success')
-    return redirect(url_for('admin.users'))
\ No newline at end of file
+    return redirect(url_for('admin.users'))
+
+def _trending(window, n):
+    """Top links and profiles for a window, resolved to titles/usernames."""
+    top_links = heavy_hitters.top('link', window, n)
+    top_profiles = heavy_hitters.top('profile', window, n)
+    links = {str(link.id): link for link in
+             Link.query.filter(Link.id.in_([int(key) for key, _, _ in top_links])).all()} if top_links else {}
+    users = {str(user.id): user for user in
+             User.query.filter(User.id.in_([int(key) for key, _, _ in top_profiles])).all()} if top_profiles else {}
+    return {
+        'window': window,
+        'links': [{'id': int(key), 'title': links[key].title, 'url': links[key].url,
+                   'clicks': count, 'error': error}
+                  for key, count, error in top_links if key in links],
+        'profiles': [{'id': int(key), 'username': users[key].username,
+                      'views': count, 'error': error}
+                     for key, count, error in top_profiles if key in users],
+    }
+
+@bp.route('/trending')
+@login_required
+@admin_required
+def trending():
+    window = request.args.get('window', 'hour')
+    if window not in heavy_hitters.WINDOWS:
+        abort(404)
+    n = min(request.args.get('n', 20, type=int), 100)
+    return render_template('admin/trending.html', trending=_trending(window, n),
+                           windows=list(heavy_hitters.WINDOWS))
+
+@bp.route('/trending.json')
+@login_required
+@admin_required
+def trending_json():
+    window = request.args.get('window', 'hour')
+    if window not in heavy_hitters.WINDOWS:
+        abort(404)
+    n = min(request.args.get('n', 20, type=int), 100)
+    return jsonify(_trending(window, n))
@@ -0,0 +1,7 @@
+"""
+Click and profile-view analytics.
+
+Raw events are still stored in `Click`, but everything the dashboards read comes
+from rollups maintained at ingestion time, so reads never scan raw clicks.
+"""
+from app.analytics.ingest import record_click, record_profile_view, store_click
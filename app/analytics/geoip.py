@@ -0,0 +1,137 @@
+"""
+Offline IP-to-country lookup.
+
+Ranges are stored in a compact binary file (see `build`) that is memory-mapped,
+so every worker process shares the same pages through the OS page cache, and
+searched with a binary search. File layout:
+
+    8-byte magic, uint32 IPv4 range count, uint32 IPv6 range count,
+    IPv4 ranges: 4-byte start, 4-byte end, 2-byte country code,
+    IPv6 ranges: 16-byte start, 16-byte end, 2-byte country code,
+
+with addresses big-endian and ranges sorted by start, so comparing raw bytes
+orders them like the addresses themselves.
+"""
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+from functools import lru_cache
+from flask import current_app
+
+MAGIC = b'CGEOIP1\0'
+_HEADER = struct.Struct('>8sII')
+
+
+class RangeTable:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, v4_count, v6_count = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a GeoIP range file')
+        v4_offset = _HEADER.size
+        v6_offset = v4_offset + v4_count * 10
+        self.sections = {4: (v4_offset, v4_count, 4), 6: (v6_offset, v6_count, 16)}
+
+    def lookup(self, packed, version):
+        offset, count, width = self.sections[version]
+        record = 2 * width + 2
+        # Find the last range starting at or before the address.
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = offset + mid * record
+            if self.map[start:start + width] <= packed:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        start = offset + (lo - 1) * record
+        if packed > self.map[start + width:start + 2 * width]:
+            return None
+        return self.map[start + 2 * width:start + record].decode('ascii')
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def database_path():
+    return current_app.config.get('GEOIP_DATABASE') or \
+        os.path.join(current_app.instance_path, 'geoip.bin')
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                path = database_path()
+                # Without a range file, lookups simply return None.
+                _table = RangeTable(path) if os.path.exists(path) else False
+    return _table
+
+
+@lru_cache(maxsize=65536)
+def _cached_lookup(ip_address):
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return _table.lookup(address.packed, address.version)
+
+
+def country_for_ip(ip_address):
+    """Returns the two-letter country code for an IP address, or None."""
+    if not ip_address or not _get_table():
+        return None
+    return _cached_lookup(ip_address)
+
+
+def _parse_address(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return ipaddress.IPv4Address(number) if number < 2 ** 32 else ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+def build(csv_path, output_path):
+    """
+    Builds a range file from a CSV of `start_ip,end_ip,country_code[,...]` rows.
+    Addresses may be dotted/colon notation or integers (as in the IP2Location
+    and DB-IP "lite" country databases). Returns (IPv4 ranges, IPv6 ranges).
+    """
+    ranges = {4: [], 6: []}
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            country = row[2].strip().upper()
+            if len(country) != 2 or not country.isalpha():
+                continue  # headers, '-' and other placeholders
+            try:
+                start, end = _parse_address(row[0]), _parse_address(row[1])
+            except ValueError:
+                continue
+            if start.version != end.version:
+                continue
+            if start.version == 6 and start.ipv4_mapped and end.ipv4_mapped:
+                start, end = start.ipv4_mapped, end.ipv4_mapped
+            ranges[start.version].append((start.packed, end.packed, country.encode('ascii')))
+
+    tmp_path = output_path + '.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(ranges[4]), len(ranges[6])))
+        for version in (4, 6):
+            for start, end, country in sorted(ranges[version]):
+                f.write(start + end + country)
+    os.replace(tmp_path, output_path)
+    return len(ranges[4]), len(ranges[6])
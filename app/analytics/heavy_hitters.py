@@ -0,0 +1,182 @@
+import json
+import os
+import socket
+import threading
+import time
+from datetime import timezone
+from flask import current_app
+
+# Window name -> (bucket length in seconds, number of buckets kept)
+WINDOWS = {
+    'hour': (300, 12),
+    'day': (3600, 24),
+}
+KINDS = ('link', 'profile')
+# Snapshots older than the longest window are of no use to any window
+_MAX_WINDOW_SECONDS = max(length * count for length, count in WINDOWS.values())
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of the most frequent keys using at most `capacity`
+    counters. Every reported count is an upper bound that overestimates the true
+    count by no more than the key's recorded error.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, key, amount=1):
+        if key in self.counts:
+            self.counts[key] += amount
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = amount
+            self.errors[key] = 0
+        else:
+            # Replace the smallest counter; the new key inherits its count as error.
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            del self.errors[victim]
+            self.counts[key] = floor + amount
+            self.errors[key] = floor
+
+    def _floor(self):
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """Merges another summary into this one, keeping the `capacity` largest counters."""
+        own_floor, other_floor = self._floor(), other._floor()
+        counts, errors = {}, {}
+        for key in set(self.counts) | set(other.counts):
+            counts[key] = self.counts.get(key, own_floor) + other.counts.get(key, other_floor)
+            errors[key] = self.errors.get(key, own_floor) + other.errors.get(key, other_floor)
+        keep = sorted(counts, key=counts.get, reverse=True)[:self.capacity]
+        self.counts = {key: counts[key] for key in keep}
+        self.errors = {key: errors[key] for key in keep}
+        return self
+
+    def top(self, n=10):
+        keys = sorted(self.counts, key=self.counts.get, reverse=True)[:n]
+        return [(key, self.counts[key], self.errors[key]) for key in keys]
+
+    def to_dict(self):
+        return {key: [self.counts[key], self.errors[key]] for key in self.counts}
+
+    @classmethod
+    def from_dict(cls, data, capacity=100):
+        summary = cls(capacity)
+        for key, (count, error) in data.items():
+            summary.counts[key] = count
+            summary.errors[key] = error
+        return summary
+
+
+class HeavyHitters:
+    """
+    Per-process sliding-window heavy hitters for links and profiles.
+
+    Each window is a ring of time buckets, each holding its own Space-Saving
+    summary, so memory is bounded by buckets x capacity. Workers periodically
+    publish their buckets to a snapshot file in a shared directory; readers
+    merge every worker's snapshot (see `top`).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {(kind, window): {} for kind in KINDS for window in WINDOWS}
+        self.last_publish = 0
+
+    def record(self, kind, key, at=None):
+        now = int(time.time())
+        at = int(at or now)
+        capacity = current_app.config['HEAVY_HITTERS_CAPACITY']
+        with self.lock:
+            for window, (length, count) in WINDOWS.items():
+                if at <= now - length * count:
+                    # Late events (e.g. replayed clicks) that fall outside the window
+                    continue
+                buckets = self.buckets[(kind, window)]
+                start = at - at % length
+                if start not in buckets:
+                    buckets[start] = SpaceSaving(capacity)
+                    for old in [b for b in buckets if b <= now - length * count]:
+                        del buckets[old]
+                buckets[start].add(str(key))
+        if now - self.last_publish >= current_app.config['HEAVY_HITTERS_PUBLISH_SECONDS']:
+            self.publish(now)
+
+    def publish(self, now=None):
+        """Atomically writes this worker's buckets to its snapshot file."""
+        self.last_publish = int(now or time.time())
+        with self.lock:
+            snapshot = {
+                f'{kind}:{window}': {str(start): summary.to_dict() for start, summary in buckets.items()}
+                for (kind, window), buckets in self.buckets.items()
+            }
+        directory = snapshot_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{socket.gethostname()}-{os.getpid()}.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+
+tracker = HeavyHitters()
+
+
+def snapshot_dir():
+    return current_app.config.get('HEAVY_HITTERS_DIR') or \
+        os.path.join(current_app.instance_path, 'heavy_hitters')
+
+
+def record_hit(kind, key, at=None):
+    """Counts a hit on `key`; `at` is a datetime for events that happened earlier."""
+    tracker.record(kind, key, at.replace(tzinfo=timezone.utc).timestamp() if at else None)
+
+
+def top(kind, window, n=10):
+    """
+    Returns the `n` heaviest keys as (key, count, error) tuples, merged across
+    every worker that published within the window.
+    """
+    length, count = WINDOWS[window]
+    capacity = current_app.config['HEAVY_HITTERS_CAPACITY']
+    now = time.time()
+    cutoff = now - length * count
+    tracker.publish(now)
+
+    merged = SpaceSaving(capacity)
+    directory = snapshot_dir()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.endswith('.json'):
+            continue
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            continue
+        if modified < now - _MAX_WINDOW_SECONDS:
+            # Left behind by a worker that exited (e.g. recycled by max_requests).
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        if modified < cutoff:
+            # Published before this window began, so it has nothing to add here;
+            # longer windows may still need it.
+            continue
+        try:
+            with open(path) as f:
+                buckets = json.load(f).get(f'{kind}:{window}', {})
+        except (OSError, ValueError):
+            continue
+        for start, data in buckets.items():
+            if int(start) > cutoff:
+                merged.merge(SpaceSaving.from_dict(data, capacity))
+    return merged.top(n)
@@ -0,0 +1,137 @@
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import User, Link, Click, LinkDailyStat, LinkDailyBreakdown, ProfileDailyStat
+from app.analytics.rollups import locked_rollup, increment
+from app.analytics.hyperloglog import HyperLogLog
+from app.analytics.useragent import parse_user_agent, referrer_domain
+from app.analytics.geoip import country_for_ip
+from app.analytics import timeseries
+from app.analytics.heavy_hitters import record_hit
+from app.analytics.spool import spool_click, spool_dir, segments, read_segment
+
+
+def _add_visitor(model, visitor, **key):
+    """
+    Adds `visitor` to the sketch on the (existing) rollup row for `key`. Repeat
+    visitors usually leave the sketch untouched, so the row is only locked and
+    the blob rewritten when it changes.
+    """
+    if not visitor:
+        return
+    blob = db.session.query(model.visitors).filter_by(**key).scalar()
+    if not (HyperLogLog.from_bytes(blob) if blob else HyperLogLog()).add(visitor):
+        return
+    row = locked_rollup(model, **key)
+    # Read again under the lock, in case another worker rewrote it in between.
+    sketch = HyperLogLog.from_bytes(row.visitors) if row.visitors else HyperLogLog()
+    if sketch.add(visitor):
+        row.visitors = sketch.to_bytes()
+
+
+def record_click(link, ip_address=None, user_agent=None, referrer=None, timestamp=None, event_id=None):
+    """
+    Stores a click on `link` and updates the link's daily rollup.
+    The caller is responsible for committing the session.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    country = country_for_ip(ip_address)
+    click = Click(link_id=link.id, timestamp=timestamp, ip_address=ip_address,
+                  user_agent=user_agent, referrer=referrer, country=country, event_id=event_id)
+    db.session.add(click)
+
+    increment(LinkDailyStat, [{'link_id': link.id, 'day': timestamp.date(), 'clicks': 1}], 'clicks')
+    _add_visitor(LinkDailyStat, ip_address, link_id=link.id, day=timestamp.date())
+
+    browser, os_family, device = parse_user_agent(user_agent)
+    increment(LinkDailyBreakdown, [
+        {'link_id': link.id, 'day': timestamp.date(), 'dimension': dimension, 'value': value, 'count': 1}
+        for dimension, value in (('referrer', referrer_domain(referrer)), ('browser', browser),
+                                 ('os', os_family), ('device', device), ('country', country or 'Unknown'))
+    ], 'count')
+
+    timeseries.bump(link.user_id, 'clicks', timestamp)
+    record_hit('link', link.id, at=timestamp)
+
+    # New clicks change the owner's dashboard (see app.conditional). Only a stale
+    # stamp is refreshed, so clicks do not all queue on the owner's row lock;
+    # User.stats_version covers the clicks in between.
+    now = datetime.utcnow()
+    User.query.filter(User.id == link.user_id, db.or_(
+        User.stats_updated_at.is_(None),
+        User.stats_updated_at < now - timedelta(seconds=current_app.config['STATS_TOUCH_SECONDS']))
+    ).update({'stats_updated_at': now}, synchronize_session=False)
+    return click
+
+
+def record_profile_view(user, ip_address=None, timestamp=None):
+    """
+    Updates the profile's daily view rollup.
+    The caller is responsible for committing the session.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    increment(ProfileDailyStat, [{'user_id': user.id, 'day': timestamp.date(), 'views': 1}], 'views')
+    _add_visitor(ProfileDailyStat, ip_address, user_id=user.id, day=timestamp.date())
+    timeseries.bump(user.id, 'views', timestamp)
+    record_hit('profile', user.id, at=timestamp)
+
+
+def store_click(link, ip_address=None, user_agent=None, referrer=None):
+    """
+    Records and commits a click. If the database write fails, or exceeds
+    CLICK_WRITE_TIMEOUT_MS on PostgreSQL, the click goes to the local spool
+    instead, to be loaded later by `flask clicks replay`.
+    """
+    timestamp = datetime.utcnow()
+    try:
+        timeout = current_app.config.get('CLICK_WRITE_TIMEOUT_MS')
+        if timeout and db.engine.dialect.name == 'postgresql':
+            db.session.execute(text(f'SET LOCAL statement_timeout = {int(timeout)}'))
+        record_click(link, ip_address=ip_address, user_agent=user_agent,
+                     referrer=referrer, timestamp=timestamp)
+        db.session.commit()
+    except SQLAlchemyError:
+        current_app.logger.warning('Click on link %s spooled: database write failed', link.id, exc_info=True)
+        try:
+            db.session.rollback()
+        except SQLAlchemyError:
+            pass
+        spool_click(link, timestamp, ip_address=ip_address, user_agent=user_agent, referrer=referrer)
+
+
+def replay_spool(chunk_size=1000):
+    """
+    Loads spooled clicks through the normal ingestion path, one transaction per
+    chunk. Clicks already in the database (by event id) or on deleted links are
+    skipped, so replaying twice is harmless. Finished segments are deleted once
+    fully loaded. Returns (loaded, skipped).
+    """
+    loaded = skipped = 0
+    for path, finished in segments(spool_dir()):
+        records = read_segment(path)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            seen = {event_id for event_id, in db.session.query(Click.event_id).filter(
+                Click.event_id.in_([record['event_id'] for record in chunk]))}
+            links = {link.id: link for link in Link.query.filter(
+                Link.id.in_({record['link_id'] for record in chunk}))}
+            for record in chunk:
+                link = links.get(record['link_id'])
+                if link is None or record['event_id'] in seen:
+                    skipped += 1
+                    continue
+                seen.add(record['event_id'])
+                record_click(link, ip_address=record['ip_address'], user_agent=record['user_agent'],
+                             referrer=record['referrer'], timestamp=record['timestamp'],
+                             event_id=record['event_id'])
+                loaded += 1
+            db.session.commit()
+        if finished:
+            os.remove(path)
+    return loaded, skipped
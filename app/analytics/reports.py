@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import LinkDailyStat, LinkDailyBreakdown, ProfileDailyStat
+from app.analytics.hyperloglog import HyperLogLog
+
+
+def _window_start(days):
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def link_unique_visitors(link_ids, days=30):
+    """
+    Estimated unique visitors per link over the last `days` days.
+    Reads at most `days` sketches per link, regardless of click volume.
+    """
+    if not link_ids:
+        return {}
+    rows = db.session.query(LinkDailyStat.link_id, LinkDailyStat.visitors).filter(
+        LinkDailyStat.link_id.in_(link_ids),
+        LinkDailyStat.day >= _window_start(days)
+    ).all()
+    sketches = {link_id: HyperLogLog() for link_id in link_ids}
+    for link_id, blob in rows:
+        if blob:
+            sketches[link_id].merge(HyperLogLog.from_bytes(blob))
+    return {link_id: sketch.count() for link_id, sketch in sketches.items()}
+
+
+def profile_unique_visitors(user, days=30):
+    """Estimated unique visitors to a user's public profile over the last `days` days."""
+    blobs = db.session.query(ProfileDailyStat.visitors).filter(
+        ProfileDailyStat.user_id == user.id,
+        ProfileDailyStat.day >= _window_start(days)
+    ).all()
+    return HyperLogLog.merged(blob for blob, in blobs).count()
+
+
+def link_breakdowns(link_ids, days=30, limit=5):
+    """
+    Top values per dimension ('referrer', 'browser', 'os', 'device', 'country') across the
+    given links over the last `days` days, as {dimension: [(value, clicks), ...]}.
+    """
+    result = {'referrer': [], 'browser': [], 'os': [], 'device': [], 'country': []}
+    if not link_ids:
+        return result
+    total = db.func.sum(LinkDailyBreakdown.count)
+    rows = db.session.query(LinkDailyBreakdown.dimension, LinkDailyBreakdown.value, total).filter(
+        LinkDailyBreakdown.link_id.in_(link_ids),
+        LinkDailyBreakdown.day >= _window_start(days)
+    ).group_by(LinkDailyBreakdown.dimension, LinkDailyBreakdown.value).order_by(total.desc()).all()
+    for dimension, value, clicks in rows:
+        if len(result.setdefault(dimension, [])) < limit:
+            result[dimension].append((value, int(clicks)))
+    return result
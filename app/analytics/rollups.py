@@ -0,0 +1,73 @@
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def locked_rollup(model, **key):
+    """
+    Returns the rollup row for `key`, locked for update and created if missing.
+    Rows are remembered until the transaction ends, since the lock is held until
+    then; a batch touching the same rollup many times only queries it once.
+    """
+    locked = db.session.info.setdefault('locked_rollups', {})
+    memo_key = (model, tuple(sorted(key.items())))
+    row = locked.get(memo_key)
+    if row is not None:
+        return row
+    row = model.query.filter_by(**key).with_for_update().first()
+    if row is None:
+        try:
+            with db.session.begin_nested():
+                row = model(**key)
+                db.session.add(row)
+        except IntegrityError:
+            # Another worker created the row first.
+            row = model.query.filter_by(**key).with_for_update().first()
+    locked[memo_key] = row
+    return row
+
+
+def increment(model, rows, *counters):
+    """
+    Adds the `counters` columns of each of `rows` (dicts of column values) to the
+    matching rollup rows in one INSERT ... ON CONFLICT DO UPDATE, creating rows
+    that are missing. The other columns must be the rollup's unique key. Nothing
+    is read or locked beforehand; falls back to locked_rollup on databases
+    without upserts. Rows are written in the order given, so callers touching
+    several rows keep a fixed order to avoid deadlocks.
+    """
+    merged = {}
+    for row in rows:
+        key = tuple((name, value) for name, value in row.items() if name not in counters)
+        totals = merged.setdefault(key, dict.fromkeys(counters, 0))
+        for name in counters:
+            totals[name] += row[name]
+    if not merged:
+        return
+
+    insert = _UPSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        for key, totals in merged.items():
+            rollup = locked_rollup(model, **dict(key))
+            for name, amount in totals.items():
+                setattr(rollup, name, (getattr(rollup, name) or 0) + amount)
+        return
+
+    table = model.__table__
+    statement = insert(table).values([dict(key, **totals) for key, totals in merged.items()])
+    statement = statement.on_conflict_do_update(
+        index_elements=[name for name, _ in next(iter(merged))],
+        set_={name: table.c[name] + statement.excluded[name] for name in counters})
+    db.session.execute(statement)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_locked_rollups(session, *args):
+    session.info.pop('locked_rollups', None)
@@ -0,0 +1,134 @@
+"""
+Local click spool, used when clicks cannot be written to the database.
+
+Each worker appends to its own segment file. Records are length-prefixed and
+checksummed JSON (4-byte length, 4-byte CRC32, payload), so a torn write at the
+end of a segment is detected and ignored. Writes are flushed to the OS
+immediately and fsynced in batches. Segments are rotated by size, and
+`flask clicks replay` loads them back into the database.
+"""
+import fcntl
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+from flask import current_app
+
+_HEADER = struct.Struct('>II')
+OPEN_SUFFIX = '.open'
+READY_SUFFIX = '.ready'
+
+
+def spool_dir():
+    return current_app.config.get('CLICK_SPOOL_DIR') or \
+        os.path.join(current_app.instance_path, 'click_spool')
+
+
+class ClickSpool:
+    """Append-only, size-rotated spool segment owned by the current process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.pid = None
+        self.unsynced = 0
+        self.last_sync = 0
+
+    def _open(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        name = f'clicks-{socket.gethostname()}-{os.getpid()}-{time.time_ns()}'
+        self.file = open(os.path.join(directory, name + OPEN_SUFFIX), 'ab')
+        # The lock tells replay this segment still has a live writer.
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.pid = os.getpid()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def _rotate(self):
+        self._sync()
+        path = self.file.name
+        os.replace(path, path[:-len(OPEN_SUFFIX)] + READY_SUFFIX)
+        self.file.close()
+        self.file = None
+
+    def append(self, record):
+        config = current_app.config
+        payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        with self.lock:
+            if self.file is None or self.pid != os.getpid():
+                # First write, or a forked child that inherited the parent's handle.
+                self._open(spool_dir())
+            self.file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= config['CLICK_SPOOL_FSYNC_EVERY'] or \
+                    time.monotonic() - self.last_sync >= config['CLICK_SPOOL_FSYNC_SECONDS']:
+                self._sync()
+            if self.file.tell() >= config['CLICK_SPOOL_MAX_BYTES']:
+                self._rotate()
+
+
+spool = ClickSpool()
+
+
+def spool_click(link, timestamp, ip_address=None, user_agent=None, referrer=None):
+    """Appends a click to the local spool. Returns its event id."""
+    event_id = uuid.uuid4().hex
+    spool.append({
+        'event_id': event_id,
+        'link_id': link.id,
+        'timestamp': timestamp.isoformat(),
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'referrer': referrer,
+    })
+    return event_id
+
+
+def read_segment(path):
+    """Yields the complete records of a segment, stopping at a torn or corrupt tail."""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            length, checksum = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            record = json.loads(payload)
+            record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+            yield record
+
+
+def segments(directory):
+    """
+    Returns (path, finished) for every segment. A segment is finished once it
+    has been rotated or its writer has exited; live segments can be replayed too,
+    but must be kept (replay deduplicates on event id).
+    """
+    if not os.path.isdir(directory):
+        return []
+    result = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(READY_SUFFIX):
+            result.append((path, True))
+        elif name.endswith(OPEN_SUFFIX):
+            with open(path, 'rb') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    result.append((path, False))
+                else:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                    result.append((path, True))
+    return result
@@ -0,0 +1,205 @@
+"""
+Per-user activity time series, read from pre-aggregated ActivityBucket rows.
+
+Every event bumps an hourly and a daily bucket, so a series over any range
+reads at most one row per hour (ranges up to HOURLY_MAX_DAYS) or per day, and
+is then downsampled to at most `max_points` without visiting empty buckets.
+Lifetime totals are summed from the daily buckets, plus a 'total' baseline row
+for counts from before buckets were kept (see backfill).
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.cache import Cache
+from app.models import User, Link, Click, ActivityBucket
+from app.analytics.rollups import increment
+
+METRICS = ('clicks', 'views', 'links')
+INTERVALS = ('hour', 'day', 'week', 'month')
+EPOCH = datetime(1970, 1, 1)
+HOURLY_MAX_DAYS = 31
+MAX_POINTS = 200
+# Longest range a series may cover, by requested interval
+MAX_RANGE_DAYS = {'hour': 3 * 366, 'day': 3 * 366, 'week': 10 * 366, 'month': 20 * 366}
+
+_cache = Cache('timeseries')
+
+
+def _truncate(at, interval):
+    if interval == 'hour':
+        return at.replace(minute=0, second=0, microsecond=0)
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bump(user_id, metric, at=None, amount=1):
+    """
+    Adds `amount` to the user's hourly and daily buckets for `metric`.
+    The caller is responsible for committing the session.
+    """
+    at = at or datetime.utcnow()
+    increment(ActivityBucket, [
+        {'user_id': user_id, 'metric': metric, 'resolution': resolution, 'start': _truncate(at, resolution),
+         'count': amount}
+        for resolution in ('hour', 'day')
+    ], 'count')
+
+
+def _counts(user_id, metric, resolution, start, end):
+    rows = db.session.query(ActivityBucket.start, ActivityBucket.count).filter(
+        ActivityBucket.user_id == user_id,
+        ActivityBucket.metric == metric,
+        ActivityBucket.resolution == resolution,
+        ActivityBucket.start >= start,
+        ActivityBucket.start < end
+    ).all()
+    return rows
+
+
+def _index(at, first, interval):
+    """Number of `interval` buckets between the bucket starting at `first` and the one holding `at`."""
+    if interval == 'month':
+        return (at.year - first.year) * 12 + at.month - first.month
+    delta = at - first
+    if interval == 'hour':
+        return int(delta // timedelta(hours=1))
+    if interval == 'week':
+        return delta.days // 7
+    return delta.days
+
+
+def _bucket(first, index, interval):
+    """Start of the bucket `index` buckets after the one starting at `first`."""
+    if interval == 'month':
+        months = first.month - 1 + index
+        return first.replace(year=first.year + months // 12, month=months % 12 + 1)
+    step = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[interval]
+    return first + step * index
+
+
+def series(user_id, metric, interval, start, end, max_points=MAX_POINTS):
+    """
+    Returns (interval, buckets per point, [(bucket start, count), ...]) for
+    [start, end), zero-filled. The interval is the one actually used: hourly
+    ranges longer than HOURLY_MAX_DAYS are read by day. Each point sums
+    `buckets per point` adjacent buckets (1 unless downsampled), so at most
+    `max_points` are returned. Ranges longer than MAX_RANGE_DAYS[interval]
+    raise ValueError. Cached per user for TIMESERIES_CACHE_SECONDS.
+    """
+    if end - start > timedelta(days=MAX_RANGE_DAYS[interval]):
+        raise ValueError(f'{interval} series are limited to {MAX_RANGE_DAYS[interval]} days')
+    key = ('series', user_id, metric, interval, start, end, max_points)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    if interval == 'hour' and end - start > timedelta(days=HOURLY_MAX_DAYS):
+        interval = 'day'
+    resolution = 'hour' if interval == 'hour' else 'day'
+    first = _truncate(start, interval)
+    buckets = _index(end - timedelta(microseconds=1), first, interval) + 1
+    size = -(-buckets // max_points)
+
+    # Bins are worked out from the rows that exist, not by walking every bucket
+    totals = [0] * -(-buckets // size)
+    for bucket_start, count in _counts(user_id, metric, resolution, first, end):
+        totals[_index(bucket_start, first, interval) // size] += count
+    points = [(_bucket(first, i * size, interval), count) for i, count in enumerate(totals)]
+
+    result = (interval, size, points)
+    _cache.set(key, result, ttl=current_app.config['TIMESERIES_CACHE_SECONDS'])
+    return result
+
+
+def total(user_id, metric):
+    """Lifetime count: the daily buckets plus any baseline, summed on the bucket index."""
+    count = db.session.query(db.func.sum(ActivityBucket.count)).filter(
+        ActivityBucket.user_id == user_id,
+        ActivityBucket.metric == metric,
+        ActivityBucket.resolution.in_(['day', 'total'])
+    ).scalar()
+    return int(count or 0)
+
+
+def period_totals(user_id, metric, days):
+    """(count over the last `days` days, count over the `days` days before that)."""
+    today = _truncate(datetime.utcnow(), 'day')
+    boundary = today - timedelta(days=days - 1)
+    rows = _counts(user_id, metric, 'day', boundary - timedelta(days=days), today + timedelta(days=1))
+    current = sum(count for start, count in rows if start >= boundary)
+    previous = sum(count for start, count in rows if start < boundary)
+    return current, previous
+
+
+def _percent_change(current, previous, period):
+    if previous == 0:
+        return {'text': f'+{current} {period}' if current else f'No change {period}', 'positive': True}
+    change = round((current - previous) * 100 / previous)
+    return {'text': f'{change:+d}% {period}', 'positive': change >= 0}
+
+
+def summary(user):
+    """
+    Lifetime totals and period-over-period changes for the home page stat cards.
+    A fixed number of small queries, cached per user for TIMESERIES_CACHE_SECONDS.
+    """
+    key = ('summary', user.id)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    views_week = period_totals(user.id, 'views', 7)
+    clicks_month = period_totals(user.id, 'clicks', 30)
+    links_month, _ = period_totals(user.id, 'links', 30)
+    result = {
+        'profile_views': total(user.id, 'views'),
+        'link_clicks': total(user.id, 'clicks'),
+        'views_change': _percent_change(*views_week, 'from last week'),
+        'clicks_change': _percent_change(*clicks_month, 'from last month'),
+        'links_change': {'text': f'+{links_month} this month', 'positive': True},
+    }
+    _cache.set(key, result, ttl=current_app.config['TIMESERIES_CACHE_SECONDS'])
+    return result
+
+
+def backfill():
+    """
+    Rebuilds click and link-creation buckets from raw Click and Link rows, and
+    seeds view baselines from User.profile_views for users with no view buckets.
+    Meant to be run once after upgrading; raw clicks are streamed, not loaded.
+    """
+    counts = {}
+
+    def add(user_id, metric, at):
+        for resolution in ('hour', 'day'):
+            key = (user_id, metric, resolution, _truncate(at, resolution))
+            counts[key] = counts.get(key, 0) + 1
+
+    clicks = db.session.query(Link.user_id, Click.timestamp).join(Link, Click.link_id == Link.id).filter(
+        Click.timestamp.isnot(None)).yield_per(10000)
+    for user_id, timestamp in clicks:
+        add(user_id, 'clicks', timestamp)
+    for user_id, timestamp in db.session.query(Link.user_id, Link.timestamp).filter(
+            Link.timestamp.isnot(None)).yield_per(10000):
+        add(user_id, 'links', timestamp)
+
+    ActivityBucket.query.filter(ActivityBucket.metric.in_(['clicks', 'links'])).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(ActivityBucket, [
+        {'user_id': user_id, 'metric': metric, 'resolution': resolution, 'start': start, 'count': count}
+        for (user_id, metric, resolution, start), count in counts.items()
+    ])
+
+    seeded = {user_id for user_id, in db.session.query(ActivityBucket.user_id).filter_by(
+        metric='views').distinct()}
+    db.session.bulk_insert_mappings(ActivityBucket, [
+        {'user_id': user_id, 'metric': 'views', 'resolution': 'total', 'start': EPOCH, 'count': views}
+        for user_id, views in db.session.query(User.id, User.profile_views).filter(User.profile_views > 0)
+        if user_id not in seeded
+    ])
+    db.session.commit()
+    _cache.invalidate_all()
+    return len(counts)
@@ -0,0 +1,75 @@
+"""
+Lightweight normalization of click referrers and user agents into the
+families shown on the dashboard. This is deliberately coarse: it only needs
+to be good enough for breakdown charts, not for feature detection.
+"""
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+# Checked in order; the first match wins (e.g. Edge and Opera also claim Chrome).
+_BROWSERS = [
+    ('Bot', re.compile(r'bot|crawl|spider|slurp|facebookexternalhit|preview', re.I)),
+    ('Instagram', re.compile(r'Instagram')),
+    ('Facebook', re.compile(r'FBAN|FBAV')),
+    ('Edge', re.compile(r'Edg(e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser')),
+    ('Firefox', re.compile(r'Firefox|FxiOS')),
+    ('Chrome', re.compile(r'Chrome|CriOS')),
+    ('Safari', re.compile(r'Safari')),
+]
+_OPERATING_SYSTEMS = [
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Android', re.compile(r'Android')),
+    ('Windows', re.compile(r'Windows')),
+    ('macOS', re.compile(r'Mac OS X|Macintosh')),
+    ('Chrome OS', re.compile(r'CrOS')),
+    ('Linux', re.compile(r'Linux')),
+]
+_TABLET = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+_MOBILE = re.compile(r'Mobi|iPhone|iPod|Android')
+
+# Subdomains that only mark a mobile site or a link shim (l.instagram.com, m.facebook.com)
+_DOMAIN_PREFIXES = ('www.', 'm.', 'l.', 'lm.', 'mobile.')
+
+
+def _first_match(rules, value):
+    for name, pattern in rules:
+        if pattern.search(value):
+            return name
+    return 'Other'
+
+
+@lru_cache(maxsize=4096)
+def parse_user_agent(user_agent):
+    """Returns (browser, os, device) families. Cached, since the same strings repeat constantly."""
+    if not user_agent:
+        return 'Unknown', 'Unknown', 'Unknown'
+    browser = _first_match(_BROWSERS, user_agent)
+    if browser == 'Bot':
+        return browser, 'Other', 'Bot'
+    if _TABLET.search(user_agent):
+        device = 'Tablet'
+    elif _MOBILE.search(user_agent):
+        device = 'Mobile'
+    else:
+        device = 'Desktop'
+    return browser, _first_match(_OPERATING_SYSTEMS, user_agent), device
+
+
+def referrer_domain(referrer):
+    """Normalizes a referrer URL to its domain, or 'direct' when there is none."""
+    if not referrer:
+        return 'direct'
+    try:
+        host = (urlsplit(referrer).hostname or '').lower()
+    except ValueError:
+        return 'other'
+    if not host:
+        return 'other'
+    for prefix in _DOMAIN_PREFIXES:
+        if host.startswith(prefix) and host.count('.') > 1:
+            host = host[len(prefix):]
+            break
+    return host[:100]
@@ -0,0 +1,216 @@
+"""
+JSON API, version 1 (mounted at /api/v1), for the signed-in user's links and
+their analytics.
+
+- Lists are keyset-paginated: responses carry an opaque `next_cursor` to pass
+  back as `cursor`, or null on the last page.
+- `fields=a,b` limits each item to the named fields.
+- Rows are read as plain Core rows, never as ORM objects.
+- Responses carry an ETag, and a poll that sends it back in If-None-Match
+  gets an empty 304 when nothing has changed.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+from flask import request, jsonify, abort, make_response
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+from app import db
+from app.api import bp
+from app.models import Link, Click, LinkDailyStat
+from app.analytics.reports import link_unique_visitors, link_breakdowns
+from app.conditional import make_etag, stats_state, not_modified, add_validators
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_DAYS = 365
+
+LINK_FIELDS = {
+    'id': Link.id,
+    'title': Link.title,
+    'url': Link.url,
+    'position': Link.position,
+    'created_at': Link.timestamp,
+}
+# Computed per page, only when asked for
+LINK_EXTRA_FIELDS = ('clicks',)
+LINK_DEFAULT_FIELDS = tuple(LINK_FIELDS)
+
+CLICK_FIELDS = {
+    'id': Click.id,
+    'timestamp': Click.timestamp,
+    'referrer': Click.referrer,
+    'user_agent': Click.user_agent,
+    'country': Click.country,
+}
+
+STATS_FIELDS = ('clicks', 'unique_visitors', 'daily', 'breakdowns')
+STATS_DEFAULT_FIELDS = ('clicks', 'unique_visitors', 'daily')
+
+
+@bp.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required.'}), 401
+
+
+@bp.errorhandler(HTTPException)
+def json_error(e):
+    return jsonify({'error': e.description}), e.code
+
+
+def _fields(allowed, default):
+    if 'fields' not in request.args:
+        return list(default)
+    fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        abort(400, f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(allowed)}."
+              if unknown else 'No fields requested.')
+    return fields
+
+
+def _limit():
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    if not 1 <= limit <= MAX_LIMIT:
+        abort(400, f'limit must be between 1 and {MAX_LIMIT}.')
+    return limit
+
+
+def encode_cursor(values):
+    data = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Decodes a cursor made by encode_cursor into values of the given types, or aborts with 400."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(types):
+            raise ValueError
+        return [datetime.fromisoformat(value) if kind is datetime else kind(value)
+                for value, kind in zip(values, types)]
+    except (ValueError, TypeError):
+        abort(400, 'Invalid cursor.')
+
+
+def _page(statement, key_fields, limit):
+    """Runs a keyset page query. Returns (rows as dicts, cursor for the next page or None)."""
+    rows = [dict(row) for row in db.session.execute(statement.limit(limit + 1)).mappings()]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][key] for key in key_fields])
+
+
+def _project(rows, fields):
+    """Limits rows to the requested fields, with datetimes as ISO strings."""
+    return [{field: value.isoformat() if isinstance(value, datetime) else value
+             for field, value in ((field, row[field]) for field in fields)} for row in rows]
+
+
+def _respond(payload, etag, last_modified):
+    return add_validators(make_response(jsonify(payload)), etag, last_modified)
+
+
+def _owned_link_id(link_id):
+    owner = db.session.query(Link.user_id).filter(Link.id == link_id).scalar()
+    if owner is None or owner != current_user.id:
+        abort(404, 'No such link.')
+    return link_id
+
+
+@bp.route('/links')
+def links():
+    """The user's links in display order. Fields: id, title, url, position, created_at, clicks."""
+    fields = _fields(tuple(LINK_FIELDS) + LINK_EXTRA_FIELDS, LINK_DEFAULT_FIELDS)
+    limit = _limit()
+    counts_clicks = 'clicks' in fields
+    etag = make_etag('api.links', request.full_path, current_user.content_version,
+                     stats_state(current_user) if counts_clicks else None)
+    last_modified = max(filter(None, [current_user.content_version,
+                                      current_user.stats_version if counts_clicks else None]))
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+
+    columns = {name: LINK_FIELDS[name] for name in set(fields) | {'id', 'position'} if name in LINK_FIELDS}
+    statement = db.select(*[column.label(name) for name, column in columns.items()]).where(
+        Link.user_id == current_user.id).order_by(Link.position, Link.id.desc())
+    if 'cursor' in request.args:
+        position, id = decode_cursor(request.args['cursor'], (int, int))
+        statement = statement.where(db.or_(Link.position > position,
+                                           db.and_(Link.position == position, Link.id < id)))
+    rows, next_cursor = _page(statement, ('position', 'id'), limit)
+
+    if counts_clicks:
+        # One grouped count for the whole page, over the (link_id, timestamp) index
+        counts = dict(db.session.execute(db.select(Click.link_id, db.func.count(Click.id)).where(
+            Click.link_id.in_([row['id'] for row in rows])).group_by(Click.link_id)).all())
+        for row in rows:
+            row['clicks'] = counts.get(row['id'], 0)
+
+    items = _project(rows, fields)
+    return _respond({'links': items, 'next_cursor': next_cursor}, etag, last_modified)
+
+
+@bp.route('/links/<int:link_id>/stats')
+def link_stats(link_id):
+    """
+    Totals for one link over the last `days` days (default 30). Fields: clicks,
+    unique_visitors, daily (zero-filled per-day clicks) and, on paid plans, breakdowns.
+    """
+    _owned_link_id(link_id)
+    fields = _fields(STATS_FIELDS, STATS_DEFAULT_FIELDS)
+    days = request.args.get('days', 30, type=int)
+    if not 1 <= days <= MAX_DAYS:
+        abort(400, f'days must be between 1 and {MAX_DAYS}.')
+    if 'breakdowns' in fields and current_user.account_type == 'Free':
+        abort(403, 'Breakdowns are available on paid plans.')
+    # The window moves daily, and deleting or adding links touches content_version
+    etag = make_etag('api.link_stats', request.full_path, datetime.utcnow().date(),
+                     current_user.content_version, stats_state(current_user))
+    last_modified = max(filter(None, [current_user.content_version, current_user.stats_version]))
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+
+    result = {'link_id': link_id, 'days': days}
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    if 'clicks' in fields or 'daily' in fields:
+        daily = dict(db.session.execute(db.select(LinkDailyStat.day, LinkDailyStat.clicks).where(
+            LinkDailyStat.link_id == link_id, LinkDailyStat.day >= start)).all())
+        if 'clicks' in fields:
+            result['clicks'] = sum(count or 0 for count in daily.values())
+        if 'daily' in fields:
+            result['daily'] = [{'day': (start + timedelta(days=i)).isoformat(),
+                                'clicks': daily.get(start + timedelta(days=i)) or 0} for i in range(days)]
+    if 'unique_visitors' in fields:
+        result['unique_visitors'] = link_unique_visitors([link_id], days=days)[link_id]
+    if 'breakdowns' in fields:
+        result['breakdowns'] = {dimension: [{'value': value, 'clicks': clicks} for value, clicks in top]
+                                for dimension, top in link_breakdowns([link_id], days=days).items()}
+    return _respond(result, etag, last_modified)
+
+
+@bp.route('/links/<int:link_id>/clicks')
+def link_clicks(link_id):
+    """A link's click events, newest first. Fields: id, timestamp, referrer, user_agent, country."""
+    _owned_link_id(link_id)
+    fields = _fields(tuple(CLICK_FIELDS), tuple(CLICK_FIELDS))
+    limit = _limit()
+    etag = make_etag('api.link_clicks', request.full_path, stats_state(current_user))
+    last_modified = current_user.stats_version
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+
+    columns = {name: CLICK_FIELDS[name] for name in set(fields) | {'id', 'timestamp'}}
+    statement = db.select(*[column.label(name) for name, column in columns.items()]).where(
+        Click.link_id == link_id, Click.timestamp.isnot(None)).order_by(Click.timestamp.desc(), Click.id.desc())
+    if 'cursor' in request.args:
+        timestamp, id = decode_cursor(request.args['cursor'], (datetime, int))
+        statement = statement.where(db.or_(Click.timestamp < timestamp,
+                                           db.and_(Click.timestamp == timestamp, Click.id < id)))
+    rows, next_cursor = _page(statement, ('timestamp', 'id'), limit)
+    return _respond({'clicks': _project(rows, fields), 'next_cursor': next_cursor}, etag, last_modified)
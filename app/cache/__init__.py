@@ -0,0 +1,61 @@
+"""
+Application caches.
+
+Modules create a named `Cache` and use get/set/delete on it; entries are
+stored in the backend chosen by CACHE_BACKEND:
+
+- 'memory': an LRU dict in each worker process (the default). Fastest, but
+  every worker caches its own copy and only sees its own deletes.
+- 'sqlite': one SQLite file shared by all workers on the host (see
+  app/cache/sqlite.py), so entries are stored once and invalidated everywhere.
+
+`Cache.invalidate_all()` bumps the namespace's version instead of deleting
+its entries one by one; stale entries stop matching at once and are evicted
+later.
+"""
+import os
+import threading
+from flask import current_app
+from app.cache.memory import LRUCache, MemoryBackend
+from app.cache.sqlite import SQLiteBackend
+
+_lock = threading.Lock()
+
+
+def create_backend(config, instance_path):
+    if config.get('CACHE_BACKEND') == 'sqlite':
+        path = config.get('CACHE_SQLITE_PATH') or os.path.join(instance_path, 'cache.db')
+        return SQLiteBackend(path, max_bytes=config['CACHE_MAX_BYTES'])
+    return MemoryBackend(max_entries=config['CACHE_MAX_ENTRIES'])
+
+
+def get_backend():
+    """The current app's cache backend, created on first use."""
+    app = current_app._get_current_object()
+    backend = app.extensions.get('cache')
+    if backend is None:
+        with _lock:
+            backend = app.extensions.get('cache')
+            if backend is None:
+                backend = app.extensions['cache'] = create_backend(app.config, app.instance_path)
+    return backend
+
+
+class Cache:
+    """A namespace of cache entries, with an optional default TTL in seconds."""
+
+    def __init__(self, namespace, ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        return get_backend().get(self.namespace, key, default)
+
+    def set(self, key, value, ttl=None):
+        get_backend().set(self.namespace, key, value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        get_backend().delete(self.namespace, key)
+
+    def invalidate_all(self):
+        get_backend().bump_version(self.namespace)
@@ -0,0 +1,52 @@
+"""
+Concurrent cache benchmark. Each backend is driven by several processes at
+once, like gunicorn workers: read-through lookups over a skewed key set (80%
+of lookups hit 20% of the keys), storing a value on every miss.
+"""
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from app.cache import create_backend
+
+
+def _worker(config, instance_path, operations, keys, value_size, seed):
+    backend = create_backend(config, instance_path)
+    rng = random.Random(seed)
+    value = os.urandom(value_size)
+    hot = max(1, keys // 5)
+    hits, timings = 0, []
+    for _ in range(operations):
+        key = rng.randrange(hot) if rng.random() < 0.8 else rng.randrange(keys)
+        started = time.perf_counter()
+        if backend.get('benchmark', key) is None:
+            backend.set('benchmark', key, value, 300)
+        else:
+            hits += 1
+        timings.append(time.perf_counter() - started)
+    return hits, timings
+
+
+def run(config, backend_name, processes=4, operations=20000, keys=2000, value_size=256):
+    """
+    Returns {'ops_per_second', 'hit_rate', 'p50_us', 'p99_us'} for `backend_name`
+    ('memory' or 'sqlite'), using a throwaway SQLite file.
+    """
+    with tempfile.TemporaryDirectory() as instance_path:
+        config = {**config, 'CACHE_BACKEND': backend_name, 'CACHE_SQLITE_PATH': None}
+        per_process = operations // processes
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            results = pool.starmap(_worker, [(config, instance_path, per_process, keys, value_size, seed)
+                                             for seed in range(processes)])
+        elapsed = time.perf_counter() - started
+    timings = sorted(t for _, process_timings in results for t in process_timings)
+    total = len(timings)
+    return {
+        'ops_per_second': total / elapsed,
+        'hit_rate': sum(hits for hits, _ in results) / total,
+        'p50_us': statistics.median(timings) * 1e6,
+        'p99_us': timings[int(total * 0.99) - 1] * 1e6,
+    }
@@ -0,0 +1,77 @@
+"""In-process cache backend. Fast, but every worker process has its own copy."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with optional per-entry expiry."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryBackend:
+    """
+    Cache backend over a single LRUCache bounded to `max_entries`. Entries are
+    keyed by (namespace, namespace version, key), so bumping a namespace's
+    version orphans all of its entries at once; they age out of the LRU.
+    """
+
+    def __init__(self, max_entries=25000):
+        self.entries = LRUCache(maxsize=max_entries)
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, namespace, key, default=None):
+        return self.entries.get((namespace, self.versions.get(namespace, 0), key), default)
+
+    def set(self, namespace, key, value, ttl=None):
+        self.entries.set((namespace, self.versions.get(namespace, 0), key), value, ttl=ttl)
+
+    def delete(self, namespace, key):
+        self.entries.delete((namespace, self.versions.get(namespace, 0), key))
+
+    def bump_version(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
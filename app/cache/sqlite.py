@@ -0,0 +1,196 @@
+"""
+Cache backend in a local SQLite file (WAL mode), shared by every worker
+process on the host, so an entry is stored once and a delete or version bump
+is seen by all workers immediately.
+
+Values are pickled. Entries carry the version of their namespace at write
+time and only match while it is current. The file is bounded by total value
+size: once it exceeds `max_bytes`, expired entries, entries of old namespace
+versions and then the least recently read entries are evicted.
+
+Deletes and version bumps run after the database commit they invalidate, so
+they never raise: if the file is locked, the key (or namespace) is
+remembered, treated as a miss in this process and the invalidation is retried
+on later cache calls.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, '
+    'version INTEGER NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))',
+    'CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)',
+    'CREATE TABLE IF NOT EXISTS versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)',
+]
+
+_CURRENT_VERSION = 'COALESCE((SELECT version FROM versions WHERE namespace = ?), 0)'
+_GET = f'SELECT value, expires, accessed FROM entries WHERE namespace = ? AND key = ? AND version = {_CURRENT_VERSION}'
+
+# Reads refresh an entry's LRU timestamp at most this often, so hot keys do
+# not turn every read into a write.
+_ACCESS_RESOLUTION = 5.0
+# Check the total size every this many writes.
+_EVICT_EVERY = 100
+# Failed deletes and version bumps are retried at most this often, so a locked file does not
+# cost every request the connection timeout.
+_RETRY_SECONDS = 5.0
+
+
+def _key(key):
+    return key if isinstance(key, str) else repr(key)
+
+
+class SQLiteBackend:
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+        self.writes = 0
+        # (namespace, key) of deletes that failed and are still to be retried
+        self.pending_deletes = set()
+        # Namespaces whose version bump failed and is still to be retried
+        self.pending_bumps = set()
+        self.retried = 0.0
+        self.lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, namespace, key, default=None):
+        key = _key(key)
+        now = time.time()
+        if self.pending_deletes or self.pending_bumps:
+            self._retry_invalidations(now)
+            if (namespace, key) in self.pending_deletes or namespace in self.pending_bumps:
+                return default
+        try:
+            conn = self._connection()
+            row = conn.execute(_GET, (namespace, key, namespace)).fetchone()
+            if row is None:
+                return default
+            value, expires, accessed = row
+            if expires is not None and expires < now:
+                return default
+            if now - accessed > _ACCESS_RESOLUTION:
+                conn.execute('UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?',
+                             (now, namespace, key))
+            return pickle.loads(value)
+        except sqlite3.Error:
+            # A cache that cannot be read is just a miss.
+            logger.exception('Cache read failed')
+            return default
+
+    def set(self, namespace, key, value, ttl=None):
+        now = time.time()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (namespace, key, version, value, size, expires, accessed) '
+                f'VALUES (?, ?, {_CURRENT_VERSION}, ?, ?, ?, ?)',
+                (namespace, _key(key), namespace, data, len(data),
+                 now + ttl if ttl is not None else None, now))
+            if self.pending_deletes:
+                # A fresh value replaces the stale one the failed delete was for.
+                with self.lock:
+                    self.pending_deletes.discard((namespace, _key(key)))
+            self.writes += 1
+            if self.writes % _EVICT_EVERY == 0:
+                self.evict()
+        except sqlite3.Error:
+            logger.exception('Cache write failed')
+
+    def delete(self, namespace, key):
+        key = _key(key)
+        try:
+            self._connection().execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+        except sqlite3.Error:
+            logger.exception('Cache delete failed; retrying later')
+            with self.lock:
+                self.pending_deletes.add((namespace, key))
+
+    def _retry_invalidations(self, now):
+        with self.lock:
+            if now - self.retried < _RETRY_SECONDS:
+                return
+            self.retried = now
+            deletes, bumps = list(self.pending_deletes), list(self.pending_bumps)
+        try:
+            conn = self._connection()
+            for namespace, key in deletes:
+                conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+                with self.lock:
+                    self.pending_deletes.discard((namespace, key))
+            for namespace in bumps:
+                self._bump(conn, namespace)
+                with self.lock:
+                    self.pending_bumps.discard(namespace)
+        except sqlite3.Error:
+            logger.warning('Cache invalidation retry failed; %d deletes and %d version bumps pending',
+                           len(self.pending_deletes), len(self.pending_bumps))
+
+    @staticmethod
+    def _bump(conn, namespace):
+        conn.execute(
+            'INSERT INTO versions (namespace, version) VALUES (?, 1) '
+            'ON CONFLICT (namespace) DO UPDATE SET version = version + 1', (namespace,))
+
+    def bump_version(self, namespace):
+        try:
+            self._bump(self._connection(), namespace)
+        except sqlite3.Error:
+            logger.exception('Cache version bump failed; retrying later')
+            with self.lock:
+                self.pending_bumps.add(namespace)
+
+    def evict(self):
+        """Trims the file back under `max_bytes`. Returns the number of entries removed."""
+        conn = self._connection()
+        size = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if size <= self.max_bytes:
+            return 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            removed = conn.execute(
+                'DELETE FROM entries WHERE expires < ? OR version != '
+                'COALESCE((SELECT version FROM versions WHERE versions.namespace = entries.namespace), 0)',
+                (time.time(),)).rowcount
+            size = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            # Drop the least recently read entries until 10% under the limit.
+            target = self.max_bytes * 0.9
+            while size > target:
+                rows = conn.execute('SELECT namespace, key, size FROM entries ORDER BY accessed LIMIT 500').fetchall()
+                if not rows:
+                    break
+                for namespace, key, entry_size in rows:
+                    if size <= target:
+                        break
+                    conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+                    size -= entry_size
+                    removed += 1
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return removed
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM entries')
+        conn.execute('DELETE FROM versions')
@@ -1,3 +1,5 @@
+import math
+import sys
 import click
 from flask.cli import with_appcontext
 from app.models import User, Subscription
@@ -24,6 +26,46 @@ def grant_admin(email):
     db.session.commit()
     print(f"User {user.username} (Email: {email}) has been granted admin privileges.")
 
+@users.command(name='hash-benchmark')
+@with_appcontext
+@click.option('--target-ms', type=float, default=100.0, help='Target time for one password check.')
+@click.option('--method', default=None, help='Hash method to time (default: PASSWORD_HASH_METHOD).')
+@click.option('--rounds', type=int, default=10, help='Number of timed hashes.')
+def hash_benchmark(target_ms, method, rounds):
+    """Times password hashing under a policy and suggests a cost for a target latency."""
+    import statistics
+    import time
+    from flask import current_app
+    from werkzeug.security import generate_password_hash
+    from app.models import normalize_hash_method
+
+    method = normalize_hash_method(method or current_app.config['PASSWORD_HASH_METHOD'])
+    salt_length = current_app.config['PASSWORD_SALT_LENGTH']
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash('benchmark-password', method=method, salt_length=salt_length)
+        timings.append((time.perf_counter() - started) * 1000)
+    median = statistics.median(timings)
+    print(f"{method}: median {median:.1f} ms per hash/check over {rounds} rounds "
+          f"(~{1000 / median:.0f} logins/s per core).")
+
+    name, *args = method.split(':')
+    if name == 'pbkdf2':
+        # PBKDF2 cost is linear in the iteration count.
+        iterations = max(10000, int(round(int(args[1]) * target_ms / median, -4)))
+        suggestion = f"pbkdf2:{args[0]}:{iterations}"
+    elif name == 'scrypt':
+        # scrypt cost is roughly linear in N, which must be a power of two.
+        n = 2 ** max(10, round(math.log2(int(args[0]) * target_ms / median)))
+        suggestion = f"scrypt:{n}:{args[1]}:{args[2]}"
+    else:
+        suggestion = None
+    if suggestion and suggestion != method:
+        print(f"For ~{target_ms:.0f} ms, set PASSWORD_HASH_METHOD={suggestion}")
+    elif suggestion:
+        print(f"{method} already meets the ~{target_ms:.0f} ms target.")
+
 # --- Subscriptions Command Group ---
 
 @click.group(name='subscriptions')
@@ -91,7 +133,259 @@ def downgrade_expired_subscriptions():
     db.session.commit()
     print(f"Successfully downgraded {len(expired_subscriptions)} users.")
 
+# --- Profiles Command Group ---
+
+@click.group(name='profiles')
+def profiles():
+    """Public profile commands."""
+    pass
+
+@profiles.command(name='export')
+@with_appcontext
+@click.argument('out_dir', type=click.Path(file_okay=False))
+@click.option('--full', is_flag=True, help='Re-render every profile, not only changed ones.')
+@click.option('--workers', type=int, default=None, help='Processes for full rebuilds (default: CPU count).')
+@click.option('--config', 'config_name', default='default', help='Config used by worker processes.')
+def export_profiles(out_dir, full, workers, config_name):
+    """
+    Pre-renders public profiles into OUT_DIR for static/CDN serving and writes
+    a link_id -> url redirect map (JSON and nginx map).
+    """
+    from app.static_export import export_profiles as run_export, export_redirect_map
+    started = datetime.utcnow()
+    rendered, removed = run_export(out_dir, full=full, workers=workers, config_name=config_name)
+    redirects = export_redirect_map(out_dir)
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    print(f"Rendered {rendered} profiles, removed {removed}, wrote {redirects} redirects in {elapsed:.1f}s.")
+
+# --- Clicks Command Group ---
+
+@click.group(name='clicks')
+def clicks():
+    """Click recording commands."""
+    pass
+
+@clicks.command(name='replay')
+@with_appcontext
+@click.option('--chunk-size', type=int, default=1000, help='Clicks loaded per transaction.')
+def replay_clicks(chunk_size):
+    """Loads clicks from the local spool into the database, skipping duplicates."""
+    from app.analytics.ingest import replay_spool
+    loaded, skipped = replay_spool(chunk_size=chunk_size)
+    print(f"Replayed {loaded} spooled clicks ({skipped} duplicates or deleted links skipped).")
+
+@clicks.command(name='benchmark')
+@with_appcontext
+@click.option('--link-id', type=int, default=None, help='Link to redirect to (default: the first link).')
+@click.option('--requests', 'request_count', type=int, default=2000, help='Redirects per server.')
+@click.option('--concurrency', type=int, default=50, help='Concurrent clients.')
+@click.option('--config-name', default='default', help='Config to run both servers with.')
+def benchmark_redirects(link_id, request_count, concurrency, config_name):
+    """
+    Compares redirect throughput of the async service (asgi.py) and the Flask
+    route. Every redirect records a real click.
+    """
+    from app.models import Link
+    from app.redirect_service import benchmark
+    link_id = link_id or db.session.query(db.func.min(Link.id)).scalar()
+    if link_id is None:
+        print("No links to redirect to; create one first.")
+        sys.exit(1)
+    result = benchmark(config_name, link_id, request_count, concurrency)
+    print(f"{request_count} redirects to link {link_id}, {concurrency} concurrent clients:")
+    print(f"  asgi  {result['asgi']:>8.0f} requests/s ({result['asgi_written']:.0f}/s including batched click writes)")
+    print(f"  flask {result['flask']:>8.0f} requests/s")
+
+# --- Stats Command Group ---
+
+@click.group(name='stats')
+def stats():
+    """Analytics maintenance commands."""
+    pass
+
+@stats.command(name='backfill')
+@with_appcontext
+def backfill_stats():
+    """Rebuilds the pre-aggregated activity buckets from raw clicks and links."""
+    from app.analytics.timeseries import backfill
+    buckets = backfill()
+    print(f"Rebuilt {buckets} activity buckets.")
+
+# --- GeoIP Command Group ---
+
+@click.group(name='geoip')
+def geoip():
+    """IP-to-country database commands."""
+    pass
+
+@geoip.command(name='build')
+@with_appcontext
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', default=None, help='Range file to write (default: GEOIP_DATABASE).')
+def build_geoip(csv_path, output):
+    """Rebuilds the IP range file from a start_ip,end_ip,country CSV."""
+    from app.analytics.geoip import build, database_path
+    output = output or database_path()
+    v4, v6 = build(csv_path, output)
+    print(f"Wrote {v4} IPv4 and {v6} IPv6 ranges to {output}. Restart the app to load it.")
+
+# --- Queries Command Group ---
+
+@click.group(name='queries')
+def queries():
+    """Database query commands."""
+    pass
+
+@queries.command(name='check-plans')
+@with_appcontext
+@click.option('--seed', is_flag=True, help='Insert synthetic rows first (rolled back afterwards).')
+def check_query_plans(seed):
+    """
+    EXPLAINs every hot query and fails if any of them regresses to a
+    sequential scan. Supports SQLite and PostgreSQL.
+    """
+    from app.query_plans import check_plans, seed as seed_rows
+    try:
+        if seed:
+            seed_rows()
+        results = check_plans()
+    finally:
+        db.session.rollback()
+
+    failed = 0
+    for name, ok, details in results:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failed += 1
+            for detail in details:
+                print(f"       {detail}")
+    if failed:
+        print(f"{failed} hot queries are not using an index.")
+        sys.exit(1)
+    print(f"All {len(results)} hot queries use an index.")
+
+# --- Cache Command Group ---
+
+@click.group(name='cache')
+def cache():
+    """Application cache commands."""
+    pass
+
+@cache.command(name='clear')
+@with_appcontext
+def clear_cache():
+    """Drops every entry from the configured cache backend."""
+    from app.cache import get_backend
+    get_backend().clear()
+    print("Cache cleared.")
+
+@cache.command(name='benchmark')
+@with_appcontext
+@click.option('--processes', type=int, default=4, help='Concurrent worker processes.')
+@click.option('--operations', type=int, default=20000, help='Total lookups across all processes.')
+@click.option('--keys', type=int, default=2000, help='Number of distinct keys.')
+@click.option('--value-size', type=int, default=256, help='Size of each cached value in bytes.')
+def benchmark_cache(processes, operations, keys, value_size):
+    """Compares the memory and SQLite backends under concurrent access."""
+    from flask import current_app
+    from app.cache.benchmark import run
+    print(f"{processes} processes, {operations} lookups over {keys} keys, {value_size}-byte values")
+    for backend in ('memory', 'sqlite'):
+        result = run(dict(current_app.config), backend, processes, operations, keys, value_size)
+        print(f"  {backend:<7} {result['ops_per_second']:>10.0f} ops/s  hit rate {result['hit_rate']:.1%}  "
+              f"p50 {result['p50_us']:.0f} µs  p99 {result['p99_us']:.0f} µs")
+
+# --- Data Command Group ---
+
+@click.group(name='data')
+def data():
+    """Bulk data export and import."""
+    pass
+
+def _report_table(table, rows, seconds):
+    print(f"  {table:<22} {rows:>10} rows  {rows / seconds if seconds else 0:>10.0f} rows/s", file=sys.stderr)
+
+@data.command(name='export')
+@with_appcontext
+@click.argument('path')
+@click.option('--user', 'usernames', multiple=True, help='Only export this user and their data (repeatable).')
+@click.option('--gzip/--no-gzip', 'compress', default=None, help='Compress the output (default: if PATH ends in .gz).')
+@click.option('--chunk-size', type=int, default=5000, help='Rows fetched from the database at a time.')
+def export_data_command(path, usernames, compress, chunk_size):
+    """
+    Streams users, links, subscriptions, payments, clicks and analytics rollups
+    to PATH ('-' for stdout) as JSON lines. The export includes password hashes.
+    """
+    import time
+    from app.data_transfer import export_data, open_output
+    if compress is None:
+        compress = path.endswith('.gz')
+    started = time.perf_counter()
+    with open_output(path, compress) as out:
+        counts = export_data(out, usernames=usernames, chunk_size=chunk_size, progress=_report_table)
+    db.session.rollback()
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"Exported {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s).", file=sys.stderr)
+
+@data.command(name='import')
+@with_appcontext
+@click.argument('path')
+@click.option('--chunk-size', type=int, default=5000, help='Rows per bulk insert.')
+def import_data_command(path, chunk_size):
+    """
+    Loads a `flask data export` file (plain or gzip; '-' for stdin) in one
+    transaction. Accounts whose email already exists are skipped, and so are
+    clicks and payments whose event id or reference is already taken.
+    """
+    import time
+    from app.data_transfer import import_data, open_input
+    started = time.perf_counter()
+    try:
+        with open_input(path) as lines:
+            inserted, skipped = import_data(lines, chunk_size=chunk_size, progress=_report_table)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        print(f"Import failed, nothing was imported: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    total = sum(inserted.values())
+    print(f"Imported {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s); skipped "
+          f"{skipped['user']} existing accounts, {skipped['plan']} existing plans and "
+          f"{sum(skipped.values()) - skipped['user'] - skipped['plan']} rows belonging to them "
+          f"or already present.", file=sys.stderr)
+
+# --- Startup Profile Command ---
+
+@click.command(name='startup-profile')
+@click.option('--config-name', default='default', help='Config to pass to create_app.')
+@click.option('--top', type=int, default=15, help='Number of packages and modules to list.')
+def startup_profile(config_name, top):
+    """Reports cold-start import and create_app() time by package and module."""
+    from app.startup_profile import profile
+    try:
+        result = profile(config_name)
+    except RuntimeError as e:
+        print(f"Profiling failed: {e}")
+        sys.exit(1)
+    print(f"Importing app: {result['import_ms']:.0f} ms, create_app(): {result['create_app_ms']:.0f} ms")
+    print("\nImport time by package (self time, both phases):")
+    for name, ms in result['packages'][:top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    print("\nSlowest modules:")
+    for name, phase, ms in result['modules'][:top]:
+        print(f"  {ms:8.1f} ms  {name} ({phase})")
+
 def init_app(app):
     app.cli.add_command(users)
     app.cli.add_command(subscriptions)
-    app.cli.add_command(plans)
\ No newline at end of file
+    app.cli.add_command(plans)
+    app.cli.add_command(profiles)
+    app.cli.add_command(clicks)
+    app.cli.add_command(stats)
+    app.cli.add_command(geoip)
+    app.cli.add_command(queries)
+    app.cli.add_command(cache)
+    app.cli.add_command(data)
+    app.cli.add_command(startup_profile)
\ No newline at end of file
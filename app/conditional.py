@@ -0,0 +1,75 @@
+import hashlib
+import time
+from datetime import date, timezone
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from app.analytics import timeseries
+
+
+def make_etag(*parts):
+    """Strong ETag from the values a rendered page depends on."""
+    parts = (current_app.config.get('RELEASE'),) + parts
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def viewer_state():
+    """
+    What the page chrome (navbar, grace-period banner) depends on for the
+    current viewer. Anonymous viewers all share the same state.
+    """
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return (current_user.id, current_user.content_version, current_user.is_admin,
+            current_user.account_type, date.today())
+
+
+def stats_state(user):
+    """
+    What pages showing the user's click stats depend on: the lifetime click
+    total, which changes with every click (stats_updated_at is only refreshed
+    once a minute; see User.stats_version).
+    """
+    return timeseries.total(user.id, 'clicks')
+
+
+def csrf_state():
+    """
+    Pages with forms embed a CSRF token, which is only valid for
+    WTF_CSRF_TIME_LIMIT seconds, so their ETags rotate every half period.
+    """
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    period = int(time.time() // (limit // 2)) if limit else None
+    return session.get('csrf_token'), period
+
+
+def _last_modified(value):
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Returns a 304 response if the request's validators match, otherwise None.
+    Requests with pending flash messages always get a full render.
+    """
+    if '_flashes' in session:
+        return None
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        matched = _last_modified(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return add_validators(make_response('', 304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _last_modified(last_modified)
+    # Always revalidate: the pages depend on the session, so keep them private.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,274 @@
+"""
+Streaming export and import of accounts and their data as JSON lines.
+
+Every line is one row: {"_table": <table name>, <column>: <value>, ...}, with
+dates as ISO strings and binary values (visitor sketches) base64-encoded.
+Tables come parents first, so an import never sees a row before the rows it
+references. The first line is a header with the format version.
+
+Export reads each table through a server-side cursor, so memory does not
+grow with the number of rows. Import gives every row a new id and rewrites
+foreign keys through old -> new id maps. Rows that have dependants (plans,
+users, links) are inserted one by one to learn their new ids; everything else
+is inserted in chunks with a single executemany. Plans are matched to existing
+ones by name. Users whose email already exists are skipped, together with
+everything that belongs to them, and so are clicks and payments whose event id
+or reference is already taken, so importing the same file twice is harmless.
+"""
+import base64
+import gzip
+import io
+import json
+import sys
+import time
+from datetime import date, datetime
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import (Plan, User, Subscription, Payment, Link, Click, LinkDailyStat,
+                        LinkDailyBreakdown, ProfileDailyStat, ActivityBucket)
+
+FORMAT_VERSION = 1
+
+# Parents before children
+MODELS = [Plan, User, Subscription, Payment, Link, Click, LinkDailyStat, LinkDailyBreakdown,
+          ProfileDailyStat, ActivityBucket]
+_TABLES = {model.__table__.name: model.__table__ for model in MODELS}
+_ORDER = {name: index for index, name in enumerate(_TABLES)}
+
+
+def _references(table):
+    """{column name: referenced table name} for the table's foreign keys."""
+    return {column.name: foreign_key.column.table.name
+            for column in table.columns for foreign_key in column.foreign_keys}
+
+
+# Globally unique columns besides the user's email: rows whose value is already
+# taken (a click replayed into two databases, a payment recorded twice) are skipped
+_UNIQUE_COLUMNS = {'click': 'event_id', 'payment': 'reference'}
+
+# Tables whose old -> new ids are kept, because other tables reference them
+_PARENTS = {parent for table in _TABLES.values() for parent in _references(table).values()}
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+
+def _decoder(column):
+    if isinstance(column.type, db.DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, db.Date):
+        return date.fromisoformat
+    if isinstance(column.type, db.LargeBinary):
+        return base64.b64decode
+    return None
+
+
+def open_output(path, compress):
+    stream = sys.stdout.buffer if path == '-' else open(path, 'wb')
+    if compress:
+        stream = gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=6)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def open_input(path):
+    """Opens an export for reading, gzip-compressed or not."""
+    stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def _export_filters(usernames):
+    """Per-table WHERE clauses restricting an export to the given users, or {} for everything."""
+    if not usernames:
+        return {}
+    user_ids = select(User.id).where(User.username.in_(usernames)).scalar_subquery()
+    link_ids = select(Link.id).where(Link.user_id.in_(user_ids)).scalar_subquery()
+    filters = {'user': User.id.in_(user_ids)}
+    for name, table in _TABLES.items():
+        for column, parent in _references(table).items():
+            if parent == 'user':
+                filters[name] = table.c[column].in_(user_ids)
+            elif parent == 'link':
+                filters[name] = table.c[column].in_(link_ids)
+    return filters
+
+
+def export_data(out, usernames=None, chunk_size=5000, progress=None):
+    """
+    Writes every table (or only what belongs to `usernames`) to the text stream
+    `out`. Calls progress(table, rows, seconds) as each table finishes and
+    returns {table: rows}.
+    """
+    out.write(json.dumps({'_table': 'header', 'format': FORMAT_VERSION,
+                          'exported_at': datetime.utcnow().isoformat()}) + '\n')
+    filters = _export_filters(usernames)
+    connection = db.session.connection()
+    counts = {}
+    for name, table in _TABLES.items():
+        started = time.perf_counter()
+        statement = select(table).order_by(table.c.id)
+        if name in filters:
+            statement = statement.where(filters[name])
+        result = connection.execution_options(stream_results=True).execute(statement)
+        count = 0
+        for rows in result.partitions(chunk_size):
+            out.write(''.join(
+                json.dumps({'_table': name, **{key: _encode(value) for key, value in row._mapping.items()}},
+                           separators=(',', ':')) + '\n'
+                for row in rows))
+            count += len(rows)
+        counts[name] = count
+        if progress:
+            progress(name, count, time.perf_counter() - started)
+    return counts
+
+
+class _Importer:
+    def __init__(self, connection):
+        self.connection = connection
+        # {table name: {old id: new id, or None for rows that were skipped}}
+        self.ids = {name: {} for name in _TABLES}
+        self.inserted = {name: 0 for name in _TABLES}
+        self.skipped = {name: 0 for name in _TABLES}
+
+    def _prepare(self, name, record):
+        """Decodes a record into column values with remapped foreign keys, or None to skip it."""
+        table = _TABLES[name]
+        values = {}
+        for column in table.columns:
+            if column.name not in record or column.name == 'id':
+                continue
+            value = record[column.name]
+            decode = _decoder(column)
+            values[column.name] = decode(value) if decode and value is not None else value
+        for column, parent in _references(table).items():
+            old = values.get(column)
+            if old is not None:
+                values[column] = self.ids[parent].get(old)
+                if values[column] is None:
+                    return None
+        return values
+
+    def _skip_taken(self, name, rows):
+        column = _TABLES[name].c[_UNIQUE_COLUMNS[name]]
+        values = [values[column.name] for _, values in rows if values.get(column.name) is not None]
+        if not values:
+            return rows
+        taken = set(self.connection.execute(select(column).where(column.in_(values))).scalars())
+        kept = [(old_id, values) for old_id, values in rows if values.get(column.name) not in taken]
+        self.skipped[name] += len(rows) - len(kept)
+        return kept
+
+    def _insert_one(self, table, values):
+        return self.connection.execute(table.insert(), values).inserted_primary_key[0]
+
+    def load(self, name, records):
+        table = _TABLES[name]
+        rows = []
+        for record in records:
+            values = self._prepare(name, record)
+            if values is None:
+                self.skipped[name] += 1
+                if name in _PARENTS:
+                    self.ids[name][record.get('id')] = None
+            else:
+                rows.append((record.get('id'), values))
+        if name in _UNIQUE_COLUMNS:
+            rows = self._skip_taken(name, rows)
+        if name == 'plan':
+            existing = dict(self.connection.execute(select(Plan.name, Plan.id).where(
+                Plan.name.in_([values['name'] for _, values in rows]))).all())
+            for old_id, values in rows:
+                if values['name'] in existing:
+                    self.ids[name][old_id] = existing[values['name']]
+                    self.skipped[name] += 1
+                else:
+                    self.ids[name][old_id] = self._insert_one(table, values)
+                    self.inserted[name] += 1
+        elif name == 'user':
+            emails = {email.lower() for email, in self.connection.execute(select(User.email).where(
+                db.func.lower(User.email).in_([(values.get('email') or '').lower() for _, values in rows])))}
+            new_rows = [(old_id, values) for old_id, values in rows
+                        if (values.get('email') or '').lower() not in emails]
+            taken = [username for username, in self.connection.execute(select(User.username).where(
+                User.username.in_([values.get('username') for _, values in new_rows])))]
+            if taken:
+                raise ValueError(f"Usernames already taken by other accounts: {', '.join(sorted(taken))}")
+            for old_id, values in rows:
+                if (values.get('email') or '').lower() in emails:
+                    self.ids[name][old_id] = None
+                    self.skipped[name] += 1
+                else:
+                    self.ids[name][old_id] = self._insert_one(table, values)
+                    self.inserted[name] += 1
+        elif name == 'link':
+            for old_id, values in rows:
+                self.ids[name][old_id] = self._insert_one(table, values)
+                self.inserted[name] += 1
+        elif rows:
+            # Nothing references these rows, so their new ids are not needed.
+            self.connection.execute(table.insert(), [values for _, values in rows])
+            self.inserted[name] += len(rows)
+
+
+def import_data(lines, chunk_size=5000, progress=None):
+    """
+    Loads an export from an iterable of JSON lines into the current session's
+    transaction; the caller commits. Calls progress(table, rows, seconds) as
+    each table finishes and returns ({table: inserted}, {table: skipped}).
+    Raises ValueError on malformed input, conflicting usernames or rows that
+    collide with existing ones; the transaction must then be rolled back.
+    """
+    importer = _Importer(db.session.connection())
+    lines = iter(lines)
+    try:
+        header = json.loads(next(lines, '') or '{}')
+    except ValueError:
+        header = {}
+    if header.get('_table') != 'header' or header.get('format') != FORMAT_VERSION:
+        raise ValueError('Not a data export (or an unsupported format version).')
+
+    current, chunk, started = None, [], time.perf_counter()
+
+    def load(name, chunk):
+        try:
+            importer.load(name, chunk)
+        except IntegrityError as e:
+            raise ValueError(f'{name} rows collide with existing rows: {e.orig}') from e
+
+    def finish_table():
+        if progress and current:
+            progress(current, importer.inserted[current] + importer.skipped[current],
+                     time.perf_counter() - started)
+
+    for number, line in enumerate(lines, start=2):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            name = record.pop('_table')
+        except (ValueError, KeyError):
+            raise ValueError(f'Line {number} is not an exported row.')
+        if name not in _TABLES:
+            raise ValueError(f'Line {number}: unknown table {name!r}.')
+        if name != current or len(chunk) >= chunk_size:
+            if chunk:
+                load(current, chunk)
+                chunk = []
+            if name != current:
+                if current and _ORDER[name] < _ORDER[current]:
+                    raise ValueError(f'Line {number}: {name} rows must come before {current} rows.')
+                finish_table()
+                current, started = name, time.perf_counter()
+        chunk.append(record)
+    if chunk:
+        load(current, chunk)
+    finish_table()
+    return importer.inserted, importer.skipped
@@ -1,7 +1,10 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField
-from wtforms.validators import DataRequired, Email, EqualTo, ValidationError
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, Regexp
 from app.models import User
+from app.usernames import USERNAME_PATTERN, is_valid_username
+
+USERNAME_MESSAGE = 'Usernames may only contain letters, numbers, underscores and hyphens (64 characters max).'
 
 
 class LoginForm(FlaskForm):
@@ -12,7 +15,7 @@ class LoginForm(FlaskForm):
 
 
 class RegistrationForm(FlaskForm):
-    username = StringField('Username', validators=[DataRequired()])
+    username = StringField('Username', validators=[DataRequired(), Regexp(USERNAME_PATTERN, message=USERNAME_MESSAGE)])
     email = StringField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Password', validators=[DataRequired()])
     password2 = PasswordField(
@@ -41,6 +44,8 @@ class LinkForm(FlaskForm):
 
 
 class EditProfileForm(FlaskForm):
+    # Checked in validate_username, and only when it changes, so accounts with
+    # names from before USERNAME_PATTERN can still edit their profile.
     username = StringField('Username', validators=[DataRequired()])
     bio = TextAreaField('About me', validators=[Length(min=0, max=140)])
     payment_link = StringField('Payment Link (e.g., Paystack, Flutterwave)')
@@ -63,6 +68,8 @@ class EditProfileForm(FlaskForm):
 
     def validate_username(self, username):
         if username.data != self.original_username:
+            if not is_valid_username(username.data):
+                raise ValidationError(USERNAME_MESSAGE)
             user = User.query.filter_by(username=self.username.data).first()
             if user is not None:
                 raise ValidationError('Please use a different username.')
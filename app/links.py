@@ -0,0 +1,114 @@
+"""
+Batch link management: validating, bulk-inserting, importing and reordering
+many links at once. Callers commit the session, so each batch is one
+transaction.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from urllib.parse import urlsplit
+from flask import current_app
+from app import db
+from app.models import User, Link
+from app.analytics import timeseries
+
+# Column sizes of Link.title and Link.url
+TITLE_MAX_LENGTH = 140
+URL_MAX_LENGTH = 200
+
+
+def validate_links(items):
+    """
+    Checks a list of {'title', 'url'} dicts. Returns (rows, errors), where
+    errors is a list of {'index', 'error'}; rows are only usable if there are none.
+    """
+    rows, errors = [], []
+    if not isinstance(items, list) or not items:
+        return [], [{'index': None, 'error': 'Expected a non-empty list of links.'}]
+    if len(items) > current_app.config['LINK_BATCH_MAX']:
+        return [], [{'index': None, 'error': f"At most {current_app.config['LINK_BATCH_MAX']} links per batch."}]
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Expected an object with a title and a url.'})
+            continue
+        title = str(item.get('title') or '').strip()
+        url = str(item.get('url') or '').strip()
+        if not title or len(title) > TITLE_MAX_LENGTH:
+            errors.append({'index': index, 'error': f'Title must be 1-{TITLE_MAX_LENGTH} characters.'})
+        elif not url or len(url) > URL_MAX_LENGTH or urlsplit(url).scheme not in ('http', 'https') \
+                or not urlsplit(url).netloc:
+            errors.append({'index': index, 'error': 'URL must be an http(s) address of at most '
+                                                    f'{URL_MAX_LENGTH} characters.'})
+        else:
+            rows.append({'title': title, 'url': url})
+    return rows, errors
+
+
+def link_limit_error(user, adding):
+    """Returns an error message if adding `adding` links would exceed the user's plan, else None."""
+    limit = current_app.config['FREE_LINK_LIMIT']
+    if user.account_type != 'Free':
+        return None
+    # Lock the user row so concurrent batches cannot both pass the check.
+    db.session.query(User.id).filter(User.id == user.id).with_for_update().one()
+    existing = user.links.count()
+    if existing + adding > limit:
+        return (f'Free accounts can have at most {limit} links; you have {existing} '
+                f'and tried to add {adding}. Please upgrade to add more.')
+    return None
+
+
+def create_links(user, rows):
+    """
+    Appends validated rows after the user's existing links with one bulk
+    insert. Returns the number of links created.
+    """
+    now = datetime.utcnow()
+    last = db.session.query(db.func.max(Link.position)).filter(Link.user_id == user.id).scalar()
+    start = 0 if last is None else last + 1
+    db.session.bulk_insert_mappings(Link, [
+        {'title': row['title'], 'url': row['url'], 'user_id': user.id, 'position': start + i, 'timestamp': now}
+        for i, row in enumerate(rows)])
+    timeseries.bump(user.id, 'links', now, amount=len(rows))
+    user.touch()
+    return len(rows)
+
+
+def reorder_links(user, link_ids):
+    """
+    Sets the display order to `link_ids`, which must list each of the user's
+    links exactly once, with a single UPDATE. Returns an error message or None.
+    """
+    if not isinstance(link_ids, list) or not all(isinstance(id, int) for id in link_ids):
+        return 'Expected a list of link ids.'
+    owned = {id for id, in db.session.query(Link.id).filter(Link.user_id == user.id)}
+    if len(link_ids) != len(owned) or set(link_ids) != owned:
+        return 'The order must list each of your links exactly once.'
+    if link_ids:
+        positions = {id: position for position, id in enumerate(link_ids)}
+        Link.query.filter(Link.user_id == user.id).update(
+            {Link.position: db.case(positions, value=Link.id)}, synchronize_session=False)
+    user.touch()
+    return None
+
+
+def parse_import(filename, data):
+    """
+    Reads links from an uploaded CSV (title,url columns; header optional) or
+    JSON file (a list of {'title', 'url'}, or {'links': [...]}). Raises
+    ValueError if the file cannot be parsed.
+    """
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        items = json.loads(text)
+        return items.get('links') if isinstance(items, dict) else items
+    try:
+        rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    except csv.Error as e:
+        raise ValueError(str(e))
+    if rows and [cell.strip().lower() for cell in rows[0][:2]] == ['title', 'url']:
+        rows = rows[1:]
+    if any(len(row) < 2 for row in rows):
+        raise ValueError('Each CSV row needs a title and a url.')
+    return [{'title': row[0], 'url': row[1]} for row in rows]
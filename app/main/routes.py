@@ -2,83 +2,167 @@ from flask import render_template
 from flask_login import login_required, current_user, user_logged_in
 from app.main import bp
 from app.models import User
+from app.analytics import store_click, record_profile_view
+from app.analytics.reports import link_unique_visitors, link_breakdowns, profile_unique_visitors
+from app.analytics import timeseries
+from app.usernames import resolve_username, invalidate_username
+from app.redirects import resolve_link, invalidate_link
+from app.links import validate_links, link_limit_error, create_links, reorder_links, parse_import
+from app.conditional import make_etag, viewer_state, stats_state, csrf_state, not_modified, add_validators
 from datetime import date
 
 @bp.route('/')
 @bp.route('/index')
 @login_required
 def index():
+    stats = timeseries.summary(current_user)
     links_created = current_user.links.count()
-    link_clicks = sum(link.clicks.count() for link in current_user.links)
-    profile_views = current_user.profile_views or 0
     days_streak = current_user.login_streak or 0
+    unique_visitors = profile_unique_visitors(current_user)
     return render_template('index.html', title='Home',
                            links_created=links_created,
-                           link_clicks=link_clicks,
-                           profile_views=profile_views,
-                           days_streak=days_streak)
+                           link_clicks=stats['link_clicks'],
+                           profile_views=stats['profile_views'],
+                           days_streak=days_streak,
+                           unique_visitors=unique_visitors,
+                           stats=stats)
+
+def _parse_utc(value):
+    """Parses an ISO datetime; aware values are converted to naive UTC like the stored timestamps."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@bp.route('/stats/timeseries')
+@login_required
+def stats_timeseries():
+    """
+    Click, view and link-creation series for the current user.
+    Query args: metrics (comma-separated), interval (hour/day/week/month),
+    start/end (ISO dates, end exclusive, UTC unless an offset is given; default
+    the last 30 days, at most timeseries.MAX_RANGE_DAYS). The response gives
+    the interval actually used and how many of its buckets each point sums.
+    """
+    metrics = request.args.get('metrics', ','.join(timeseries.METRICS)).split(',')
+    interval = request.args.get('interval', 'day')
+    if interval not in timeseries.INTERVALS or not set(metrics) <= set(timeseries.METRICS):
+        abort(400)
+    try:
+        end = _parse_utc(request.args['end']) if 'end' in request.args else \
+            datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        start = _parse_utc(request.args['start']) if 'start' in request.args else \
+            end - timedelta(days=30)
+        if start >= end:
+            abort(400)
+        # Raises ValueError for ranges over timeseries.MAX_RANGE_DAYS
+        series = {metric: timeseries.series(current_user.id, metric, interval, start, end) for metric in metrics}
+    except (ValueError, OverflowError):
+        abort(400)
+    # Every metric is bucketed the same way for the same range
+    used_interval, buckets_per_point, _ = series[metrics[0]]
+    return jsonify({
+        'interval': used_interval,
+        'requested_interval': interval,
+        'buckets_per_point': buckets_per_point,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': {
+            metric: [{'t': bucket.isoformat(), 'v': count} for bucket, count in points]
+            for metric, (_, _, points) in series.items()
+        },
+    })
 
 from app.forms import LinkForm, EditProfileForm
-from flask import flash, redirect, url_for, request, current_app, abort
-from app.models import Link, Click, Subscription, Plan, Payment
+from flask import flash, redirect, url_for, request, current_app, abort, make_response, jsonify
+from app.models import Link, Subscription, Plan, Payment
 from app import db, csrf
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import hmac
 import hashlib
 import json
 from werkzeug.utils import secure_filename
 import os
 import secrets
-from paystackapi.customer import Customer
-from paystackapi.transaction import Transaction
 
 
 @bp.route('/<username>')
 def public_profile(username):
-    user = User.query.filter_by(username=username).first_or_404()
-    links = user.links.order_by(Link.timestamp.desc()).all()
+    user = resolve_username(username)
+    if user is None:
+        abort(404)
+    etag = make_etag('profile', user.id, user.content_version, viewer_state())
+    last_modified = user.content_version
 
     # Increment profile views if viewed by another authenticated user
     if current_user.is_authenticated and current_user.id != user.id:
         user.profile_views = (user.profile_views or 0) + 1
+
+    # Daily view rollup and unique-visitor sketch, excluding the owner's own visits
+    if not current_user.is_authenticated or current_user.id != user.id:
+        record_profile_view(user, ip_address=request.remote_addr)
         db.session.commit()
 
-    return render_template('public_profile.html', user=user, links=links)
+    # Views are counted above, but an unchanged page is neither queried nor rendered
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+
+    links = user.ordered_links().all()
+    response = make_response(render_template('public_profile.html', user=user, links=links))
+    return add_validators(response, etag, last_modified)
 
 @bp.route('/redirect/<int:link_id>')
 def redirect_to_url(link_id):
-    link = Link.query.get_or_404(link_id)
-    click = Click(
-        link_id=link.id,
-        ip_address=request.remote_addr,
-        user_agent=request.user_agent.string,
-        referrer=request.referrer
-    )
-    db.session.add(click)
-    db.session.commit()
+    link = resolve_link(link_id)
+    if link is None:
+        abort(404)
+    store_click(link,
+                ip_address=request.remote_addr,
+                user_agent=request.user_agent.string,
+                referrer=request.referrer)
     return redirect(link.url)
 
 @bp.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
+    etag = last_modified = None
+    if request.method == 'GET':
+        etag = make_etag('dashboard', stats_state(current_user), viewer_state(), csrf_state())
+        last_modified = max(filter(None, [current_user.content_version, current_user.stats_version]))
+        response = not_modified(etag, last_modified)
+        if response is not None:
+            return response
+
     form = LinkForm()
     if form.validate_on_submit():
-        if current_user.account_type == 'Free' and current_user.links.count() >= 2:
+        if current_user.account_type == 'Free' and \
+                current_user.links.count() >= current_app.config['FREE_LINK_LIMIT']:
             flash('You have reached the maximum number of links for a free account. Please upgrade to add more.')
         else:
-            link = Link(title=form.title.data, url=form.url.data, author=current_user)
-            db.session.add(link)
+            # Appended after the existing links, like batch adds and imports
+            create_links(current_user, [{'title': form.title.data, 'url': form.url.data}])
             db.session.commit()
             flash('Your link has been added!')
         return redirect(url_for('main.dashboard'))
-    links = current_user.links.order_by(Link.timestamp.desc()).all()
+    links = current_user.ordered_links().all()
     total_clicks = sum(link.clicks.count() for link in links)
 
+    unique_visitors = link_unique_visitors([link.id for link in links])
+    breakdowns = None
+    if current_user.account_type != 'Free':
+        breakdowns = link_breakdowns([link.id for link in links])
+
     show_form = True
-    if current_user.account_type == 'Free' and len(links) >= 2:
+    if current_user.account_type == 'Free' and len(links) >= current_app.config['FREE_LINK_LIMIT']:
         show_form = False
 
-    return render_template('dashboard.html', user=current_user, links=links, form=form, total_clicks=total_clicks, show_form=show_form)
+    response = make_response(render_template('dashboard.html', user=current_user, links=links, form=form,
+                                             total_clicks=total_clicks, unique_visitors=unique_visitors,
+                                             breakdowns=breakdowns, show_form=show_form))
+    if etag is not None:
+        add_validators(response, etag, last_modified)
+    return response
 
 @bp.route('/edit_profile', methods=['GET', 'POST'])
 @login_required
@@ -99,10 +183,14 @@ def edit_profile():
         else:
             current_user.selected_theme = form.theme.data
 
+        old_username = current_user.username
         current_user.username = form.username.data
         current_user.bio = form.bio.data
         current_user.payment_link = form.payment_link.data
+        current_user.touch()
         db.session.commit()
+        if current_user.username != old_username:
+            invalidate_username(old_username, current_user.username)
         flash('Your changes have been saved.')
         return redirect(url_for('main.edit_profile'))
     elif request.method == 'GET':
@@ -137,7 +225,9 @@ def subscribe(plan_id):
     db.session.add(payment)
     db.session.commit()
 
-    # Initialize a one-time transaction with Paystack
+    # Initialize a one-time transaction with Paystack. Imported here because the
+    # Paystack client (and requests) is slow to import and only needed at checkout.
+    from paystackapi.transaction import Transaction
     transaction = Transaction.initialize(
         email=current_user.email,
         amount=plan.price,  # Amount is in Kobo
@@ -202,6 +292,7 @@ def paystack_webhook():
                     )
                     db.session.add(subscription)
 
+            user.touch()
             db.session.commit()
 
     return {'status': 'success'}, 200
@@ -234,16 +325,82 @@ def delete_link(link_id):
     if link.author != current_user:
         abort(403)
     db.session.delete(link)
+    current_user.touch()
     db.session.commit()
+    invalidate_link(link_id)
     flash('Your link has been deleted.')
     return redirect(url_for('main.dashboard'))
 
+@bp.route('/links/batch', methods=['POST'])
+@login_required
+def create_links_batch():
+    """
+    Adds many links in one transaction. JSON body: {"links": [{"title", "url"}, ...]}.
+    Nothing is added unless every link is valid and the whole batch fits the plan.
+    """
+    payload = request.get_json(silent=True) or {}
+    rows, errors = validate_links(payload.get('links'))
+    if errors:
+        return jsonify({'errors': errors}), 400
+    error = link_limit_error(current_user, len(rows))
+    if error:
+        db.session.rollback()
+        return jsonify({'errors': [{'index': None, 'error': error}]}), 403
+    created = create_links(current_user, rows)
+    db.session.commit()
+    links = current_user.ordered_links().all()
+    return jsonify({'created': created,
+                    'links': [{'id': link.id, 'title': link.title, 'url': link.url, 'position': link.position}
+                              for link in links]}), 201
+
+@bp.route('/links/reorder', methods=['POST'])
+@login_required
+def reorder_links_route():
+    """Sets the display order. JSON body: {"order": [link id, ...]} listing every link once."""
+    payload = request.get_json(silent=True) or {}
+    error = reorder_links(current_user, payload.get('order'))
+    if error:
+        return jsonify({'errors': [{'index': None, 'error': error}]}), 400
+    db.session.commit()
+    return jsonify({'order': payload['order']})
+
+@bp.route('/links/import', methods=['POST'])
+@login_required
+def import_links():
+    """Adds links from an uploaded CSV (title,url) or JSON file, all or nothing."""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        flash('Choose a CSV or JSON file to import.')
+        return redirect(url_for('main.dashboard'))
+    try:
+        items = parse_import(upload.filename, upload.read())
+    except ValueError:
+        flash('That file could not be read. Use a CSV with title,url columns or a JSON list of links.')
+        return redirect(url_for('main.dashboard'))
+    rows, errors = validate_links(items)
+    if errors:
+        for error in errors[:5]:
+            row = f"Row {error['index'] + 1}: " if error['index'] is not None else ''
+            flash(f"{row}{error['error']}")
+        flash('Nothing was imported.')
+        return redirect(url_for('main.dashboard'))
+    error = link_limit_error(current_user, len(rows))
+    if error:
+        db.session.rollback()
+        flash(error)
+        return redirect(url_for('main.dashboard'))
+    created = create_links(current_user, rows)
+    db.session.commit()
+    flash(f'Imported {created} links.')
+    return redirect(url_for('main.dashboard'))
+
 @bp.route('/cancel_subscription', methods=['POST'])
 @login_required
 def cancel_subscription():
     sub = current_user.active_subscription
     if sub:
         sub.status = 'cancelled'
+        current_user.touch()
         db.session.commit()
         flash('Your subscription has been cancelled. You will retain premium access until the end of your current billing period.')
     else:
@@ -3,7 +3,15 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime, timedelta
 from flask import current_app
-import jwt
+
+# Werkzeug's defaults for hash methods given without all of their parameters
+_HASH_METHOD_DEFAULTS = {'pbkdf2': ['sha256', '600000'], 'scrypt': ['32768', '8', '1']}
+
+def normalize_hash_method(method):
+    """'pbkdf2' -> 'pbkdf2:sha256:600000', i.e. the prefix Werkzeug stores in the hash."""
+    name, *args = method.split(':')
+    defaults = _HASH_METHOD_DEFAULTS.get(name, [])
+    return ':'.join([name] + args + defaults[len(args):])
 
 class Plan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -19,7 +27,7 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True)
     email = db.Column(db.String(120), index=True, unique=True)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     links = db.relationship('Link', backref='author', lazy='dynamic', cascade="all, delete-orphan")
     bio = db.Column(db.String(140), nullable=True)
     payment_link = db.Column(db.String(200), nullable=True)
@@ -35,25 +43,74 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.Date, nullable=True)
     login_streak = db.Column(db.Integer, default=0)
 
+    # Versioning for conditional GETs: bumped when anything rendered on the public
+    # profile or dashboard changes (profile, links, theme, plan), and on new clicks
+    # (at most once per STATS_TOUCH_SECONDS; see stats_version).
+    content_updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    stats_updated_at = db.Column(db.DateTime, nullable=True)
+
+    def touch(self):
+        """Marks the user's public content as changed."""
+        self.content_updated_at = datetime.utcnow()
+
+    @property
+    def content_version(self):
+        return self.content_updated_at or self.created_at or datetime(1970, 1, 1)
+
+    @property
+    def stats_version(self):
+        """
+        Latest time the user's click stats may have changed, or None. Clicks only
+        refresh stats_updated_at once it is STATS_TOUCH_SECONDS old, so later
+        clicks can be up to that much newer; until then this is the current time.
+        """
+        if self.stats_updated_at is None:
+            return None
+        return min(datetime.utcnow().replace(microsecond=0),
+                   self.stats_updated_at + timedelta(seconds=current_app.config['STATS_TOUCH_SECONDS']))
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(
+            password,
+            method=current_app.config['PASSWORD_HASH_METHOD'],
+            salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
+
+    def password_needs_rehash(self):
+        """True if the stored hash was made with other parameters than the current policy."""
+        method, salt, _ = self.password_hash.split('$', 2)
+        return method != normalize_hash_method(current_app.config['PASSWORD_HASH_METHOD']) or \
+            len(salt) != current_app.config['PASSWORD_SALT_LENGTH']
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """
+        Checks the password and, if it matches but was hashed under an older
+        policy, re-hashes it in place. The caller commits the session.
+        """
+        if not self.password_hash or not check_password_hash(self.password_hash, password):
+            return False
+        if self.password_needs_rehash():
+            self.set_password(password)
+        return True
 
     def get_reset_password_token(self, expires_in=600):
+        import jwt  # only needed for password resets, kept off the startup path
         return jwt.encode(
             {'reset_password': self.id, 'exp': datetime.utcnow() + timedelta(seconds=expires_in)},
             current_app.config['SECRET_KEY'], algorithm='HS256')
 
     @staticmethod
     def verify_reset_password_token(token):
+        import jwt
         try:
             id = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])['reset_password']
         except:
             return
         return User.query.get(id)
 
+    def ordered_links(self):
+        """The user's links query, in display order."""
+        return self.links.order_by(Link.position, Link.timestamp.desc())
+
     @property
     def active_subscription(self):
         # A subscription is considered active for feature access if it's in 'active' or 'cancelled' state
@@ -84,6 +141,9 @@ class Subscription(db.Model):
     end_date = db.Column(db.DateTime, nullable=True)
     plan = db.relationship('Plan', backref=db.backref('subscriptions', lazy='dynamic'))
 
+    # Serves User.active_subscription
+    __table_args__ = (db.Index('ix_subscription_user_id_status_end_date', 'user_id', 'status', 'end_date'),)
+
     def __repr__(self):
         return f'<Subscription {self.id}>'
 
@@ -100,6 +160,9 @@ class Payment(db.Model):
     user = db.relationship('User', backref=db.backref('payments', lazy='dynamic'))
     plan = db.relationship('Plan', backref=db.backref('payments', lazy='dynamic'))
 
+    # Serves payment reconciliation by status
+    __table_args__ = (db.Index('ix_payment_status_created_at', 'status', 'created_at'),)
+
     def __repr__(self):
         return f'<Payment {self.reference}>'
 
@@ -108,9 +171,14 @@ class Link(db.Model):
     title = db.Column(db.String(140))
     url = db.Column(db.String(200))
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    # Display order set by the user; links with equal positions show newest first
+    position = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     clicks = db.relationship('Click', backref='link', lazy='dynamic', cascade="all, delete-orphan")
 
+    # Serves a user's links in display order
+    __table_args__ = (db.Index('ix_link_user_id_position_timestamp', 'user_id', 'position', 'timestamp'),)
+
     def __repr__(self):
         return '<Link {}>'.format(self.title)
 
@@ -121,6 +189,80 @@ class Click(db.Model):
     ip_address = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.String(200), nullable=True)
     referrer = db.Column(db.String(200), nullable=True)
+    country = db.Column(db.String(2), nullable=True)
+    # Set for clicks replayed from the local spool, so replays are idempotent
+    event_id = db.Column(db.String(32), nullable=True, unique=True)
+
+    # Serves a link's clicks in time order, and click counts per link
+    __table_args__ = (db.Index('ix_click_link_id_timestamp', 'link_id', 'timestamp'),)
+
+    def __repr__(self):
+        return f'<Click {self.timestamp}>'
+
+class LinkDailyStat(db.Model):
+    # Per-link, per-day rollup maintained during click ingestion. `visitors` holds
+    # a serialized HyperLogLog sketch (see app.analytics.hyperloglog).
+    id = db.Column(db.Integer, primary_key=True)
+    link_id = db.Column(db.Integer, db.ForeignKey('link.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    clicks = db.Column(db.Integer, nullable=False, default=0)
+    visitors = db.Column(db.LargeBinary, nullable=True)
+
+    link = db.relationship('Link', backref=db.backref('daily_stats', lazy='dynamic', cascade="all, delete-orphan"))
+
+    __table_args__ = (db.UniqueConstraint('link_id', 'day', name='uq_link_daily_stat_link_day'),)
+
+    def __repr__(self):
+        return f'<LinkDailyStat {self.link_id} {self.day}>'
+
+class LinkDailyBreakdown(db.Model):
+    # Per-link, per-day click counts by dimension ('referrer', 'browser', 'os', 'device', 'country').
+    id = db.Column(db.Integer, primary_key=True)
+    link_id = db.Column(db.Integer, db.ForeignKey('link.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    dimension = db.Column(db.String(10), nullable=False)
+    value = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    link = db.relationship('Link', backref=db.backref('daily_breakdowns', lazy='dynamic', cascade="all, delete-orphan"))
+
+    __table_args__ = (db.UniqueConstraint('link_id', 'day', 'dimension', 'value',
+                                          name='uq_link_daily_breakdown_link_day_dimension_value'),)
+
+    def __repr__(self):
+        return f'<LinkDailyBreakdown {self.link_id} {self.day} {self.dimension}={self.value}>'
+
+class ProfileDailyStat(db.Model):
+    # Per-profile, per-day rollup of public profile views, with a HyperLogLog
+    # sketch of the visitors.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    visitors = db.Column(db.LargeBinary, nullable=True)
+
+    user = db.relationship('User', backref=db.backref('daily_stats', lazy='dynamic', cascade="all, delete-orphan"))
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='uq_profile_daily_stat_user_day'),)
+
+    def __repr__(self):
+        return f'<ProfileDailyStat {self.user_id} {self.day}>'
+
+class ActivityBucket(db.Model):
+    # Pre-aggregated per-user counts ('clicks', 'views', 'links') by hour and by
+    # day, plus a baseline for counts from before buckets were kept (resolution
+    # 'total', start at the epoch). Lifetime totals are the daily rows plus the baseline.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    metric = db.Column(db.String(10), nullable=False)
+    resolution = db.Column(db.String(5), nullable=False)
+    start = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    user = db.relationship('User', backref=db.backref('activity_buckets', lazy='dynamic', cascade="all, delete-orphan"))
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'metric', 'resolution', 'start',
+                                          name='uq_activity_bucket_user_metric_resolution_start'),)
 
     def __repr__(self):
-        return f'<Click {self.timestamp}>'
\ No newline at end of file
+        return f'<ActivityBucket {self.user_id} {self.metric} {self.resolution} {self.start}>'
\ No newline at end of file
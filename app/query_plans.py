@@ -0,0 +1,163 @@
+"""
+Query-plan regression checks for the app's hot queries.
+
+Each hot query is EXPLAINed against the configured database and must reach
+its main table through an index. On PostgreSQL sequential scans are disabled
+for the check, so the planner only falls back to one when no usable index
+exists, whatever the table sizes. On SQLite the table must be SEARCHed, not
+SCANned.
+"""
+import json
+import re
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import (User, Plan, Link, Click, Subscription, Payment, LinkDailyStat,
+                        LinkDailyBreakdown, ProfileDailyStat, ActivityBucket)
+
+
+def _hot_queries():
+    """(name, table, query) for every hot access path, mirroring the app's own queries."""
+    now = datetime.utcnow()
+    today = date.today()
+    return [
+        ('public profile username lookup', 'user',
+         User.query.filter_by(username='someone')),
+        ('user links in display order', 'link',
+         Link.query.filter(Link.user_id == 1).order_by(Link.position, Link.timestamp.desc())),
+        ('link clicks by time', 'click',
+         Click.query.filter(Click.link_id == 1).order_by(Click.timestamp.desc())),
+        ('link click count', 'click',
+         db.session.query(db.func.count(Click.id)).filter(Click.link_id == 1)),
+        ('spooled click dedup', 'click',
+         db.session.query(Click.event_id).filter(Click.event_id.in_(['a' * 32, 'b' * 32]))),
+        ('active subscription', 'subscription',
+         Subscription.query.filter(Subscription.user_id == 1,
+                                   Subscription.status.in_(['active', 'cancelled']),
+                                   Subscription.end_date > now)
+         .order_by(Subscription.end_date.desc()).limit(1)),
+        ('payments by status', 'payment',
+         Payment.query.filter(Payment.status == 'pending').order_by(Payment.created_at)),
+        ('link daily stats window', 'link_daily_stat',
+         db.session.query(LinkDailyStat.link_id, LinkDailyStat.visitors).filter(
+             LinkDailyStat.link_id.in_([1, 2]), LinkDailyStat.day >= today - timedelta(days=29))),
+        ('link breakdowns window', 'link_daily_breakdown',
+         db.session.query(LinkDailyBreakdown.dimension, LinkDailyBreakdown.value).filter(
+             LinkDailyBreakdown.link_id.in_([1, 2]), LinkDailyBreakdown.day >= today - timedelta(days=29))),
+        ('profile daily stats window', 'profile_daily_stat',
+         db.session.query(ProfileDailyStat.visitors).filter(
+             ProfileDailyStat.user_id == 1, ProfileDailyStat.day >= today - timedelta(days=29))),
+        ('activity bucket range', 'activity_bucket',
+         db.session.query(ActivityBucket.start, ActivityBucket.count).filter(
+             ActivityBucket.user_id == 1, ActivityBucket.metric == 'clicks',
+             ActivityBucket.resolution == 'day', ActivityBucket.start >= now - timedelta(days=30))),
+        ('activity lifetime total', 'activity_bucket',
+         db.session.query(db.func.sum(ActivityBucket.count)).filter(
+             ActivityBucket.user_id == 1, ActivityBucket.metric == 'clicks',
+             ActivityBucket.resolution.in_(['day', 'total']))),
+    ]
+
+
+def _explain_args(query, dialect):
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    # Plans do not depend on parameter types, so send dates as plain strings.
+    params = {key: str(value) if isinstance(value, (date, datetime)) else value
+              for key, value in compiled.params.items()}
+    if compiled.positional:
+        params = tuple(params[key] for key in compiled.positiontup)
+    return str(compiled), params
+
+
+def _sqlite_plan(connection, sql, params, table):
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    details = [row[-1] for row in rows]
+    scanned = any(re.match(rf'SCAN (TABLE )?{table}\b', detail) for detail in details)
+    searched = any(re.match(rf'SEARCH (TABLE )?{table}\b', detail) for detail in details)
+    return searched and not scanned, details
+
+
+def _postgres_plan(connection, sql, params, table):
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes, details, ok = [plan[0]['Plan']], [], True
+    while nodes:
+        node = nodes.pop()
+        relation = node.get('Relation Name')
+        details.append(node['Node Type'] + (f' on {relation}' if relation else '') +
+                       (f" using {node['Index Name']}" if 'Index Name' in node else ''))
+        if node['Node Type'] == 'Seq Scan' and relation == table:
+            ok = False
+        nodes.extend(node.get('Plans', []))
+    return ok, details
+
+
+def check_plans():
+    """Returns [(name, ok, plan details)] for every hot query."""
+    dialect = db.engine.dialect
+    if dialect.name == 'sqlite':
+        explain = _sqlite_plan
+    elif dialect.name == 'postgresql':
+        explain = _postgres_plan
+    else:
+        raise RuntimeError(f'Query plan checks are not supported on {dialect.name}')
+
+    results = []
+    connection = db.session.connection()
+    for name, table, query in _hot_queries():
+        sql, params = _explain_args(query, dialect)
+        ok, details = explain(connection, sql, params, table)
+        results.append((name, ok, details))
+    return results
+
+
+def seed(users=50, links_per_user=5, clicks_per_link=40, days=30):
+    """
+    Inserts synthetic rows so the planner sees realistic table sizes and runs
+    ANALYZE. Every table a hot query reads gets rows in proportion, including
+    the daily rollups (`days` days per link and per profile). Meant to run
+    inside a transaction that is rolled back afterwards.
+    """
+    now = datetime.utcnow()
+    today = now.date()
+    plan = Plan.query.order_by(Plan.id).first()
+    if plan is None:
+        plan = Plan(name='Plan check seed', price=0)
+        db.session.add(plan)
+        db.session.flush()
+    user_rows = [{'username': f'plancheck{i}', 'email': f'plancheck{i}@example.com',
+                  'selected_theme': 'default.css', 'profile_picture': 'default.jpg', 'is_admin': False}
+                 for i in range(users)]
+    db.session.bulk_insert_mappings(User, user_rows)
+    user_ids = [id for id, in db.session.query(User.id).filter(User.username.like('plancheck%'))]
+    db.session.bulk_insert_mappings(Link, [
+        {'title': f'Link {i}', 'url': 'https://example.com', 'user_id': user_id,
+         'timestamp': now - timedelta(days=i)}
+        for user_id in user_ids for i in range(links_per_user)])
+    link_ids = [id for id, in db.session.query(Link.id).filter(Link.user_id.in_(user_ids))]
+    db.session.bulk_insert_mappings(Click, [
+        {'link_id': link_id, 'timestamp': now - timedelta(minutes=i), 'ip_address': '127.0.0.1'}
+        for link_id in link_ids for i in range(clicks_per_link)])
+    db.session.bulk_insert_mappings(Subscription, [
+        {'user_id': user_id, 'plan_id': plan.id, 'status': 'active', 'start_date': now,
+         'end_date': now + timedelta(days=30)} for user_id in user_ids])
+    db.session.bulk_insert_mappings(Payment, [
+        {'user_id': user_id, 'plan_id': plan.id, 'amount': 0, 'status': 'success',
+         'reference': f'plancheck_{user_id}'} for user_id in user_ids])
+    db.session.bulk_insert_mappings(LinkDailyStat, [
+        {'link_id': link_id, 'day': today - timedelta(days=i), 'clicks': 1}
+        for link_id in link_ids for i in range(days)])
+    db.session.bulk_insert_mappings(LinkDailyBreakdown, [
+        {'link_id': link_id, 'day': today - timedelta(days=i), 'dimension': dimension, 'value': 'Other',
+         'count': 1}
+        for link_id in link_ids for i in range(days)
+        for dimension in ('referrer', 'browser', 'os', 'device', 'country')])
+    db.session.bulk_insert_mappings(ProfileDailyStat, [
+        {'user_id': user_id, 'day': today - timedelta(days=i), 'views': 1}
+        for user_id in user_ids for i in range(days)])
+    day_start = datetime(today.year, today.month, today.day)
+    db.session.bulk_insert_mappings(ActivityBucket, [
+        {'user_id': user_id, 'metric': metric, 'resolution': 'day', 'start': day_start - timedelta(days=i),
+         'count': 1}
+        for user_id in user_ids for metric in ('clicks', 'views', 'links') for i in range(days)])
+    db.session.execute(db.text('ANALYZE'))
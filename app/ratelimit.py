@@ -0,0 +1,167 @@
+"""
+Per-endpoint rate limiting and load shedding.
+
+Limits are token buckets keyed by client IP and, for auth endpoints, by the
+account named in the form. They are checked in a before_request hook, ahead of
+form parsing, password hashing and database work, and rejected requests get
+a bare 429. The client IP is request.remote_addr, which ProxyFix
+(PROXY_FIX_HOPS) sets to the visitor's address behind the hosting proxy.
+Buckets live either in process memory (each worker limits on its own) or in
+a local SQLite file shared by all workers on the host.
+
+When requests wait too long in the front-end queue (X-Request-Start header),
+low-priority endpoints are shed with a 503 so the rest of the site keeps
+responding.
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request, Response
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'10/minute' -> (capacity 10, refill of 10/60 tokens per second)."""
+    count, period = rate.split('/')
+    return int(count), int(count) / _PERIODS[period.strip()]
+
+
+class MemoryStore:
+    """Buckets in this process only, bounded to `max_keys` (least recently used dropped)."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class SQLiteStore:
+    """Buckets in a local SQLite file (WAL mode), shared by every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            if random.random() < 0.001:
+                # Idle buckets are full again after a day at most; drop them.
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 86400,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+
+def queue_time_ms():
+    """Time the request spent queued before reaching the app, from X-Request-Start, or None."""
+    header = request.headers.get('X-Request-Start')
+    if not header:
+        return None
+    try:
+        start = float(header.replace('t=', ''))
+    except ValueError:
+        return None
+    # Proxies send seconds (nginx $msec), milliseconds or microseconds.
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    return max(0.0, (time.time() - start) * 1000)
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('RATELIMIT_STORAGE') == 'sqlite':
+            path = app.config.get('RATELIMIT_SQLITE_PATH') or os.path.join(app.instance_path, 'ratelimit.db')
+            self.store = SQLiteStore(path)
+        else:
+            self.store = MemoryStore()
+        app.before_request(self.check)
+
+    def _limited(self, key, rate):
+        capacity, refill = parse_rate(rate)
+        allowed, tokens = self.store.take(key, capacity, refill, time.time())
+        if allowed:
+            return None
+        retry_after = max(1, math.ceil((1 - tokens) / refill))
+        return Response('Too Many Requests', 429, {'Retry-After': str(retry_after)},
+                        mimetype='text/plain')
+
+    def _shed(self, endpoint):
+        queued = queue_time_ms()
+        if queued is None:
+            return None
+        config = current_app.config
+        priority = config['LOAD_SHED_PRIORITIES'].get(endpoint, config['LOAD_SHED_DEFAULT_PRIORITY'])
+        for threshold_ms, min_priority in config['LOAD_SHED_LEVELS']:
+            if queued >= threshold_ms and priority >= min_priority:
+                return Response('Service Temporarily Overloaded', 503, {'Retry-After': '5'},
+                                mimetype='text/plain')
+        return None
+
+    def check(self):
+        config = current_app.config
+        if not config.get('RATELIMIT_ENABLED'):
+            return None
+        endpoint = request.endpoint
+        response = self._shed(endpoint)
+        if response is not None:
+            return response
+
+        limits = config['RATELIMITS'].get(endpoint)
+        if not limits or request.method not in limits.get('methods', (request.method,)):
+            return None
+        if 'ip' in limits:
+            response = self._limited(f'{endpoint}:ip:{request.remote_addr}', limits['ip'])
+            if response is not None:
+                return response
+        if 'account' in limits:
+            account = (request.form.get(limits['account_field']) or '').strip().lower()
+            if account:
+                return self._limited(f'{endpoint}:account:{account}', limits['account'])
+        return None
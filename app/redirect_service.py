@@ -0,0 +1,360 @@
+"""
+Async redirect service, served by asgi.py.
+
+Handles only GET /redirect/<link id> and, when ASGI_PROFILE_DIR points at a
+`flask profiles export` directory, GET /<username> from the exported pages.
+It skips the Flask request stack (session, user loading, context
+processors, CSRF) and runs on one event loop, so a single process can hold
+many slow connections at once.
+
+Links and users are looked up through an async driver (asyncpg or
+aiosqlite) on the app's own tables. Links are cached in the app's shared
+'links' cache, so deleting a link in the Flask app stops its redirects here
+too (with CACHE_BACKEND=sqlite on the same host; asgi.py defaults to it).
+Username lookups, only used to count views, are cached in process. Clicks and views
+are queued and written in batches, one transaction per batch, through the
+normal ingestion code (app.analytics) in a worker thread. If a batch cannot
+be written, its clicks go to the local spool like any failed click. While
+ASGI_MAX_PENDING_CLICKS are waiting to be written, further clicks are spooled
+straight away and further views are dropped, so a slow database cannot grow
+the queue without bound.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.urls import iri_to_uri
+from app import create_app, db
+from app.cache.memory import LRUCache
+from app.models import User, Link
+from app.redirects import LinkTarget, cached_link, cache_link
+from app.static_export import profile_path
+
+logger = logging.getLogger(__name__)
+
+_REDIRECT_PATH = re.compile(r'^/redirect/(\d+)$')
+
+# record_profile_view only needs the profile owner's id
+_Profile = namedtuple('_Profile', 'id')
+
+
+def async_database_url(url):
+    """Maps the app's DATABASE_URL to the matching async driver."""
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    if url.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + url[len('postgresql://'):]
+    if url.startswith('sqlite://'):
+        return 'sqlite+aiosqlite://' + url[len('sqlite://'):]
+    return url
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def client_ip(scope, hops):
+    """
+    The visitor's address: with `hops` trusted proxies in front (PROXY_FIX_HOPS),
+    the X-Forwarded-For entry they added, like ProxyFix in the Flask app.
+    """
+    client = scope.get('client')
+    forwarded = _header(scope, b'x-forwarded-for')
+    if hops and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        if len(addresses) >= hops:
+            return addresses[-hops]
+    return client[0] if client else None
+
+
+async def _respond(send, status, headers=(), body=b''):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-length', str(len(body)).encode())] + list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class RedirectService:
+    def __init__(self, config_name='default'):
+        self.flask_app = create_app(config_name)
+        config = self.flask_app.config
+        self.users = LRUCache(maxsize=10000, ttl=config['USERNAME_CACHE_SECONDS'])
+        self.profile_dir = config.get('ASGI_PROFILE_DIR')
+        self.proxy_hops = config.get('PROXY_FIX_HOPS') or 0
+        self.batch_size = config['ASGI_CLICK_BATCH_SIZE']
+        self.batch_seconds = config['ASGI_CLICK_BATCH_SECONDS']
+        self.max_pending = config['ASGI_MAX_PENDING_CLICKS']
+        self.pending = []
+        # Queued plus being written
+        self.backlog = 0
+        self.overflowing = False
+        self.dropped_views = 0
+        self.flushing = 0
+        self.engine = None
+        self.flusher = None
+        self.startup_lock = None
+        # Background flushes, referenced until done so they are not garbage-collected
+        self.tasks = set()
+        # One writer thread, so batches are written in order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='click-writer')
+
+    async def startup(self):
+        """Creates the database engine and starts the flusher, once."""
+        if self.startup_lock is None:
+            self.startup_lock = asyncio.Lock()
+        async with self.startup_lock:
+            if self.engine is None:
+                await self._start()
+
+    async def _start(self):
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            url = async_database_url(self.flask_app.config['SQLALCHEMY_DATABASE_URI'])
+            options = {} if url.startswith('sqlite') else \
+                {'pool_size': self.flask_app.config['ASGI_DB_POOL_SIZE'], 'pool_pre_ping': True}
+            self.engine = create_async_engine(url, **options)
+        except ImportError as e:
+            raise RuntimeError('The ASGI redirect service needs an async database driver; '
+                               'install requirements-asgi.txt') from e
+        self.flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def shutdown(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.flush()
+        if self.engine is not None:
+            await self.engine.dispose()
+        self.executor.shutdown(wait=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if self.engine is None:
+            # Servers run without lifespan events still get a working service.
+            await self.startup()
+        if scope['method'] not in ('GET', 'HEAD'):
+            await _respond(send, 405, [(b'allow', b'GET, HEAD')])
+            return
+        match = _REDIRECT_PATH.match(scope['path'])
+        if match:
+            await self._redirect(scope, send, int(match.group(1)))
+        elif self.profile_dir and profile_path(self.profile_dir, scope['path'][1:]):
+            await self._profile(scope, send, scope['path'][1:])
+        else:
+            await _respond(send, 404, body=b'Not Found')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _fetch(self, statement):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(statement)).first()
+
+    async def _redirect(self, scope, send, link_id):
+        with self.flask_app.app_context():
+            target = cached_link(link_id)
+        if target is None:
+            try:
+                row = await self._fetch(select(Link.id, Link.user_id, Link.url).where(Link.id == link_id))
+            except SQLAlchemyError:
+                logger.exception('Link lookup failed')
+                await _respond(send, 503, [(b'retry-after', b'5')], b'Service Unavailable')
+                return
+            if row is None:
+                await _respond(send, 404, body=b'Not Found')
+                return
+            target = LinkTarget(*row)
+            with self.flask_app.app_context():
+                cache_link(target)
+        self._queue('click', target, scope)
+        await _respond(send, 302, [(b'location', iri_to_uri(target.url).encode('latin-1'))])
+
+    async def _profile(self, scope, send, username):
+        path = profile_path(self.profile_dir, username)
+        try:
+            body = await asyncio.get_running_loop().run_in_executor(None, _read_file, path)
+        except FileNotFoundError:
+            await _respond(send, 404, body=b'Not Found')
+            return
+        user_id = self.users.get(username)
+        if user_id is None:
+            try:
+                row = await self._fetch(select(User.id).where(User.username == username))
+            except SQLAlchemyError:
+                logger.exception('Profile lookup failed')
+                row = None
+            if row is not None:
+                user_id = row[0]
+                self.users.set(username, user_id)
+        if user_id is not None:
+            self._queue('view', _Profile(user_id), scope)
+        await _respond(send, 200, [(b'content-type', b'text/html; charset=utf-8')],
+                       b'' if scope['method'] == 'HEAD' else body)
+
+    def _queue(self, kind, target, scope):
+        event = (kind, target, client_ip(scope, self.proxy_hops), _header(scope, b'user-agent'),
+                 _header(scope, b'referer'), datetime.utcnow())
+        if self.backlog >= self.max_pending:
+            self._overflow(*event)
+            return
+        self.backlog += 1
+        self.pending.append(event)
+        if len(self.pending) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self._flush_logged())
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def _overflow(self, kind, target, ip_address, user_agent, referrer, timestamp):
+        """The database is not keeping up: the click goes to the spool, a view is dropped."""
+        if not self.overflowing:
+            self.overflowing = True
+            logger.warning('%d clicks and views waiting for the database; spooling clicks and '
+                           'dropping views until it catches up', self.backlog)
+        if kind == 'view':
+            self.dropped_views += 1
+            return
+        from app.analytics.spool import spool_click
+        with self.flask_app.app_context():
+            spool_click(target, timestamp, ip_address=ip_address, user_agent=user_agent, referrer=referrer)
+
+    async def _flush_logged(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception('Click batch flush failed')
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.batch_seconds)
+            await self._flush_logged()
+
+    async def flush(self):
+        """Writes every queued click and view. Returns the number written."""
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, []
+        self.flushing += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._write, batch)
+        finally:
+            self.flushing -= 1
+            self.backlog -= len(batch)
+            if self.overflowing and self.backlog < self.max_pending:
+                self.overflowing = False
+                logger.info('Click queue caught up; %d views dropped so far', self.dropped_views)
+
+    def _write(self, batch):
+        from app.analytics.ingest import record_click, record_profile_view
+        from app.analytics.spool import spool_click
+        with self.flask_app.app_context():
+            try:
+                # Links deleted since they were cached would fail the whole batch.
+                link_ids = {target.id for kind, target, *_ in batch if kind == 'click'}
+                existing = {id for id, in db.session.query(Link.id).filter(Link.id.in_(link_ids))}
+                for kind, target, ip_address, user_agent, referrer, timestamp in batch:
+                    if kind == 'view':
+                        record_profile_view(target, ip_address=ip_address, timestamp=timestamp)
+                    elif target.id in existing:
+                        record_click(target, ip_address=ip_address, user_agent=user_agent,
+                                     referrer=referrer, timestamp=timestamp)
+                db.session.commit()
+                return len(batch)
+            except SQLAlchemyError:
+                logger.warning('Spooling a batch of %d clicks: database write failed', len(batch), exc_info=True)
+                db.session.rollback()
+                for kind, target, ip_address, user_agent, referrer, timestamp in batch:
+                    if kind == 'click':
+                        spool_click(target, timestamp, ip_address=ip_address,
+                                    user_agent=user_agent, referrer=referrer)
+                return 0
+            finally:
+                db.session.remove()
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def benchmark(config_name, link_id, requests=2000, concurrency=50):
+    """
+    Sends `requests` redirects for `link_id` through the ASGI service and through
+    the Flask route (on `concurrency` threads, like a threaded worker), in
+    process so only the application code is measured. Clicks are really
+    recorded. Returns requests/s for 'asgi' (until every response is sent),
+    'asgi_written' (until every click is also written) and 'flask'.
+    """
+    path = f'/redirect/{link_id}'
+    service = RedirectService(config_name)
+
+    async def drive_asgi():
+        await service.startup()
+        statuses = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def client(count):
+            for _ in range(count):
+                await service({'type': 'http', 'method': 'GET', 'path': path, 'client': ('127.0.0.1', 0),
+                               'headers': [(b'user-agent', b'benchmark')]}, receive, send)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(requests // concurrency) for _ in range(concurrency)))
+        answered = time.perf_counter() - started
+        while service.pending or service.flushing:
+            await service.flush()
+            await asyncio.sleep(0.01)
+        written = time.perf_counter() - started
+        await service.shutdown()
+        if set(statuses) != {302}:
+            raise RuntimeError(f'ASGI service answered {sorted(set(statuses))}')
+        return len(statuses) / answered, len(statuses) / written
+
+    asgi_rate, asgi_written_rate = asyncio.run(drive_asgi())
+
+    flask_app = service.flask_app
+    # The async service has no rate limits, so don't let them throttle the comparison
+    flask_app.config['RATELIMIT_ENABLED'] = False
+
+    def flask_client(count):
+        client = flask_app.test_client()
+        for _ in range(count):
+            response = client.get(path, headers={'User-Agent': 'benchmark'})
+            if response.status_code != 302:
+                raise RuntimeError(f'Flask route answered {response.status_code}')
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        handled = sum(pool.map(flask_client, [requests // concurrency] * concurrency))
+    flask_rate = handled / (time.perf_counter() - started)
+    return {'asgi': asgi_rate, 'asgi_written': asgi_written_rate, 'flask': flask_rate}
@@ -0,0 +1,39 @@
+from collections import namedtuple
+from flask import current_app
+from app import db
+from app.cache import Cache
+from app.models import Link
+
+# Just what a redirect needs, so it can be cached without holding ORM objects.
+LinkTarget = namedtuple('LinkTarget', 'id user_id url')
+
+_cache = Cache('links')
+
+
+def resolve_link(link_id):
+    """
+    Returns the LinkTarget for `link_id`, or None. Targets are cached for
+    LINK_CACHE_SECONDS, which also keeps cached redirects working while the
+    database is unavailable.
+    """
+    target = cached_link(link_id)
+    if target is None:
+        row = db.session.query(Link.id, Link.user_id, Link.url).filter(Link.id == link_id).first()
+        if row is None:
+            return None
+        target = LinkTarget(*row)
+        cache_link(target)
+    return target
+
+
+def cached_link(link_id):
+    """The cached LinkTarget for `link_id`, or None. Also used by the async redirect service."""
+    return _cache.get(link_id)
+
+
+def cache_link(target):
+    _cache.set(target.id, target, ttl=current_app.config['LINK_CACHE_SECONDS'])
+
+
+def invalidate_link(link_id):
+    _cache.delete(link_id)
@@ -0,0 +1,61 @@
+"""
+Cold-start profiling. A fresh interpreter is started with `-X importtime`
+(this process has already imported everything), imports the app and runs
+create_app(), and the per-module import times it prints are aggregated by
+top-level package and by phase.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+_MARKER = '--- create_app ---'
+
+_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+sys.stderr.write({_MARKER!r} + '\\n')
+sys.stderr.flush()
+create_app(sys.argv[1])
+finished = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - started) * 1000,
+                  'create_app_ms': (finished - imported) * 1000}}))
+"""
+
+
+def _parse_importtime(stderr):
+    """Yields (phase, module, self µs) from `-X importtime` output."""
+    phase = 'import'
+    for line in stderr.splitlines():
+        if line == _MARKER:
+            phase = 'create_app'
+        elif line.startswith('import time:') and not line.endswith('imported package'):
+            self_us, _, name = line[len('import time:'):].split('|')
+            yield phase, name.strip(), int(self_us)
+
+
+def profile(config_name='default'):
+    """
+    Returns {'import_ms', 'create_app_ms', 'packages': [(package, ms)],
+    'modules': [(module, phase, ms)]}, lists sorted slowest first.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _SCRIPT, config_name],
+                            cwd=root, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip()
+                           else f'profiling process exited with {result.returncode}')
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    packages = defaultdict(int)
+    modules = []
+    for phase, name, self_us in _parse_importtime(result.stderr):
+        packages[name.split('.')[0]] += self_us
+        modules.append((name, phase, self_us / 1000))
+    timings['packages'] = sorted(((name, us / 1000) for name, us in packages.items()),
+                                 key=lambda item: item[1], reverse=True)
+    timings['modules'] = sorted(modules, key=lambda item: item[2], reverse=True)
+    return timings
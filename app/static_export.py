@@ -0,0 +1,180 @@
+"""
+Static export of public profile pages, for serving from a CDN or edge cache.
+
+Each profile is rendered, as an anonymous visitor would see it, to
+`<out>/<username>/index.html`; names that cannot be served from a directory
+are skipped. A state file records which version of each profile was
+exported, so later runs only re-render users whose content_updated_at
+changed (profile, links, theme and plan changes all bump it).
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, render_template
+from app import db
+from app.models import User, Link
+from app.usernames import is_possible_username
+
+STATE_FILE = '.export-state.json'
+# Files written next to the profile directories
+_OUTPUT_FILES = {STATE_FILE, 'redirects.json', 'redirects.map'}
+
+# Flask app of a pool worker process (see _init_worker)
+_worker_app = None
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _exportable(username):
+    """Names that cannot be usernames, hidden names and the export's own files are skipped."""
+    return is_possible_username(username or '') and not username.startswith('.') \
+        and username not in _OUTPUT_FILES
+
+
+def profile_path(out_dir, username):
+    """
+    `<out_dir>/<username>/index.html`, or None if the name is not exportable or
+    would resolve to anywhere but a direct subdirectory of out_dir.
+    """
+    if not _exportable(username):
+        return None
+    directory = os.path.join(out_dir, username)
+    if os.path.dirname(os.path.realpath(directory)) != os.path.realpath(out_dir):
+        return None
+    return os.path.join(directory, 'index.html')
+
+
+def _remove_profile(out_dir, username):
+    path = profile_path(out_dir, username)
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+
+def load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'release': None, 'profiles': {}}
+
+
+def save_state(out_dir, state):
+    _write_atomic(os.path.join(out_dir, STATE_FILE), json.dumps(state))
+
+
+def current_versions():
+    """
+    user id -> (username, version) for every user whose name can be exported,
+    without loading User objects.
+    """
+    rows = db.session.query(User.id, User.username, User.content_updated_at, User.created_at).filter(
+        User.username.isnot(None)).all()
+    return {str(id): (username, (updated or created).isoformat() if (updated or created) else '')
+            for id, username, updated, created in rows if _exportable(username)}
+
+
+def render_profiles(out_dir, user_ids):
+    """Renders the given users' profiles. Returns {user id: username} for those written."""
+    written = {}
+    users = User.query.filter(User.id.in_(user_ids)).all()
+    for user in users:
+        path = profile_path(out_dir, user.username)
+        if path is None:
+            continue
+        links = user.ordered_links().all()
+        # A bare request context renders the page as an anonymous visitor sees it
+        with current_app.test_request_context('/' + user.username):
+            html = render_template('public_profile.html', user=user, links=links)
+        _write_atomic(path, html)
+        written[str(user.id)] = user.username
+    return written
+
+
+def _init_worker(config_name):
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(config_name)
+
+
+def _render_chunk(out_dir, user_ids):
+    with _worker_app.app_context():
+        written = render_profiles(out_dir, user_ids)
+        db.session.remove()
+        return written
+
+
+def export_profiles(out_dir, full=False, workers=None, chunk_size=200, config_name='default'):
+    """
+    Exports changed profiles (or all of them with `full`) and removes pages of
+    deleted or renamed users. Full rebuilds are spread over a process pool.
+    Returns (rendered, removed) counts; users whose page could not be written
+    are not counted as rendered.
+    """
+    state = load_state(out_dir)
+    release = current_app.config.get('RELEASE')
+    if state.get('release') != release:
+        # Templates may have changed with the deployed code.
+        full = True
+    exported = state.get('profiles', {})
+    versions = current_versions()
+
+    removed = 0
+    for user_id, (username, _) in list(exported.items()):
+        if user_id not in versions or versions[user_id][0] != username:
+            _remove_profile(out_dir, username)
+            del exported[user_id]
+            removed += 1
+
+    stale = [int(user_id) for user_id, (username, version) in versions.items()
+             if full or exported.get(user_id) != [username, version]]
+
+    chunks = [stale[i:i + chunk_size] for i in range(0, len(stale), chunk_size)]
+    if full and workers != 1 and len(chunks) > 1:
+        # Connections must not be shared with forked workers.
+        db.session.remove()
+        db.engine.dispose()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(config_name,)) as pool:
+            results = list(pool.map(_render_chunk, [out_dir] * len(chunks), chunks))
+    else:
+        results = [render_profiles(out_dir, chunk) for chunk in chunks]
+
+    rendered = 0
+    for written in results:
+        for user_id in written:
+            exported[user_id] = list(versions[user_id])
+        rendered += len(written)
+    save_state(out_dir, {'release': release, 'profiles': exported})
+    return rendered, removed
+
+
+def _nginx_quote(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def export_redirect_map(out_dir):
+    """
+    Writes every link's target as `redirects.json` and as an nginx `map` body
+    (`redirects.map`), so /redirect/<id> can be answered without Python.
+    Note that redirects served this way are not recorded as clicks.
+    """
+    redirects = {}
+    lines = []
+    for link_id, url in db.session.query(Link.id, Link.url).order_by(Link.id).yield_per(1000):
+        if not url:
+            continue
+        redirects[str(link_id)] = url
+        lines.append(f'/redirect/{link_id} {_nginx_quote(url)};')
+    _write_atomic(os.path.join(out_dir, 'redirects.json'), json.dumps(redirects))
+    _write_atomic(os.path.join(out_dir, 'redirects.map'), '\n'.join(lines) + '\n')
+    return len(redirects)
@@ -0,0 +1,63 @@
+import re
+from flask import current_app
+from app.cache import Cache
+from app.models import User
+
+# New and changed usernames are limited to what fits in a profile URL segment.
+# Older accounts may have other names (jane.doe), so lookups only reject names
+# that no account can have: longer than the column or containing a slash.
+USERNAME_PATTERN = r'^[A-Za-z0-9_-]{1,64}$'
+USERNAME_MAX_LENGTH = 64
+_username_re = re.compile(USERNAME_PATTERN)
+
+# Returned by the cache for names it knows nothing about; names known not to
+# exist are cached as None.
+_NOT_CACHED = object()
+
+_cache = Cache('usernames')
+
+
+def is_valid_username(username):
+    """Whether `username` may be given to an account (on registration or rename)."""
+    return bool(_username_re.match(username))
+
+
+def is_possible_username(username):
+    """Whether any account, including one registered before USERNAME_PATTERN, can have this name."""
+    return bool(username) and len(username) <= USERNAME_MAX_LENGTH and '/' not in username
+
+
+def resolve_username(username):
+    """
+    Returns the User with this username, or None.
+
+    Resolutions are cached as username -> user id. Misses are cached
+    too, for USERNAME_NEGATIVE_CACHE_SECONDS, so repeated probes for missing names
+    do not reach the database. Positive entries are re-checked against the loaded
+    user, which covers renames made in other workers.
+    """
+    if not is_possible_username(username):
+        return None
+
+    cached = _cache.get(username, _NOT_CACHED)
+    if cached is None:
+        return None
+    if cached is not _NOT_CACHED:
+        user = User.query.get(cached)
+        if user is not None and user.username == username:
+            return user
+        _cache.delete(username)
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        _cache.set(username, None, ttl=current_app.config['USERNAME_NEGATIVE_CACHE_SECONDS'])
+    else:
+        _cache.set(username, user.id, ttl=current_app.config['USERNAME_CACHE_SECONDS'])
+    return user
+
+
+def invalidate_username(*usernames):
+    """Drops cached resolutions, e.g. after a registration or a username change."""
+    for username in usernames:
+        if username:
+            _cache.delete(username)
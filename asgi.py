@@ -0,0 +1,20 @@
+"""
+Optional async entry point that serves only link redirects (and, with
+ASGI_PROFILE_DIR set, exported public profiles). Route /redirect/ to it from
+the proxy and everything else to run.py:
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --workers 2
+
+Link lookups are cached in the app's shared cache, so run it on the same host
+(and instance directory) as the Flask app; deleted links then stop
+redirecting here as soon as the Flask app invalidates them.
+"""
+import os
+
+# Share link invalidations with the Flask workers instead of caching per process
+os.environ.setdefault('CACHE_BACKEND', 'sqlite')
+
+from app.redirect_service import RedirectService
+
+app = RedirectService(os.environ.get('FLASK_CONFIG') or 'default')
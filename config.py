@@ -1,8 +1,11 @@
 import os
-from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
-load_dotenv(os.path.join(basedir, '.env'))  # for local development
+# .env is for local development only; production sets real environment
+# variables, so don't import python-dotenv unless there is a file to read.
+if os.path.exists(os.path.join(basedir, '.env')):
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(basedir, '.env'))
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
@@ -14,12 +17,28 @@ class Config:
         SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(basedir, "app.db")
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Identifies the deployed code, so ETags change when templates do
+    RELEASE = os.environ.get('RELEASE') or os.environ.get('RENDER_GIT_COMMIT') or \
+        os.environ.get('RAILWAY_GIT_COMMIT_SHA') or ''
     TESTING = False
 
+    # Number of reverse proxies in front of the app (Render and Railway have one).
+    # Their X-Forwarded-For/-Proto entries are trusted, so request.remote_addr is
+    # the visitor's address for rate limits, unique visitors and GeoIP. Set to 0
+    # when clients connect directly, or the header could be spoofed.
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS') or 1)
+
     # Paystack
     PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY')
     PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY')
 
+    # Password hashing policy (any Werkzeug method, e.g. 'pbkdf2:sha256:600000' or
+    # 'scrypt:32768:8:1'). Existing hashes are upgraded on the next successful login.
+    # Use `flask users hash-benchmark` to pick a cost for a target login latency.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_SALT_LENGTH = 16
+
     # File uploads
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'profile_pics')
 
@@ -31,9 +50,97 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     ADMINS = ['noreply@connecte.boats']
 
+    # Rate limiting: token buckets per endpoint, keyed by client IP and by the
+    # account named in the form ('memory' = per worker, 'sqlite' = shared by all
+    # workers on the host)
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'memory'
+    RATELIMIT_SQLITE_PATH = os.environ.get('RATELIMIT_SQLITE_PATH')  # defaults to <instance>/ratelimit.db
+    RATELIMITS = {
+        'auth.login': {'methods': ['POST'], 'ip': '20/minute', 'account': '5/minute', 'account_field': 'username'},
+        'auth.register': {'methods': ['POST'], 'ip': '5/minute', 'account': '3/hour', 'account_field': 'email'},
+        'auth.reset_password_request': {'methods': ['POST'], 'ip': '5/minute', 'account': '3/hour',
+                                        'account_field': 'email'},
+        'main.redirect_to_url': {'ip': '120/minute'},
+    }
+
+    # Load shedding: when X-Request-Start shows a request queued for at least
+    # `threshold_ms`, endpoints with priority >= `min_priority` get a 503.
+    # Priority 0 is never shed; higher numbers are shed first.
+    LOAD_SHED_LEVELS = [(1000, 2), (3000, 1)]
+    LOAD_SHED_DEFAULT_PRIORITY = 1
+    LOAD_SHED_PRIORITIES = {
+        'main.redirect_to_url': 0,
+        'main.public_profile': 0,
+        'main.paystack_webhook': 0,
+        'static': 0,
+        'auth.register': 2,
+        'auth.reset_password_request': 2,
+        'main.stats_timeseries': 2,
+        'admin.trending': 2,
+        'admin.trending_json': 2,
+    }
+
+    # Application cache backend: 'memory' (per worker) or 'sqlite' (one file
+    # shared by all workers on the host). Size limits apply to the whole backend.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH')  # defaults to <instance>/cache.db
+    CACHE_MAX_ENTRIES = 25000
+    CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+    # Public profile username resolution cache
+    USERNAME_CACHE_SECONDS = 300
+    USERNAME_NEGATIVE_CACHE_SECONDS = 60
+
+    # New clicks refresh the owner's stats_updated_at (used for dashboard and API
+    # ETags) at most this often
+    STATS_TOUCH_SECONDS = 60
+
+    # Click recording: database write budget and local spool fallback
+    CLICK_WRITE_TIMEOUT_MS = int(os.environ.get('CLICK_WRITE_TIMEOUT_MS') or 500)
+    CLICK_SPOOL_DIR = os.environ.get('CLICK_SPOOL_DIR')  # defaults to <instance>/click_spool
+    CLICK_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+    CLICK_SPOOL_FSYNC_EVERY = 64
+    CLICK_SPOOL_FSYNC_SECONDS = 1.0
+    LINK_CACHE_SECONDS = 300
+
+    # Async redirect service (asgi.py): optional `flask profiles export` directory
+    # to serve public profiles from, how clicks are batched before writing, and
+    # how many may wait for the database before further clicks are spooled
+    # directly (and further views dropped)
+    ASGI_PROFILE_DIR = os.environ.get('ASGI_PROFILE_DIR')
+    ASGI_CLICK_BATCH_SIZE = 200
+    ASGI_CLICK_BATCH_SECONDS = 0.5
+    ASGI_MAX_PENDING_CLICKS = 10000
+    ASGI_DB_POOL_SIZE = 10
+
+    # Links allowed on a Free account, and the most links one batch/import may add
+    FREE_LINK_LIMIT = 2
+    LINK_BATCH_MAX = 500
+
+    # IP-to-country range file, built with `flask geoip build`
+    GEOIP_DATABASE = os.environ.get('GEOIP_DATABASE')  # defaults to <instance>/geoip.bin
+
+    # Home page stats and /stats/timeseries (per-user cache)
+    TIMESERIES_CACHE_SECONDS = 60
+
+    # Trending links/profiles (per-worker heavy hitters, published to a shared directory)
+    HEAVY_HITTERS_DIR = os.environ.get('HEAVY_HITTERS_DIR')  # defaults to <instance>/heavy_hitters
+    HEAVY_HITTERS_CAPACITY = 100
+    HEAVY_HITTERS_PUBLISH_SECONDS = 10
+
+    # Compiled templates are cached on disk here (shared by all workers and kept
+    # across restarts); unset to compile from source in every process.
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    # Compile every template in create_app, so with preload_app the work is
+    # done once in the gunicorn master and shared by the workers.
+    JINJA_PRELOAD_TEMPLATES = os.environ.get('JINJA_PRELOAD_TEMPLATES', '').lower() in ('1', 'true', 'yes')
+
 
 class TestingConfig(Config):
     TESTING = True
+    RATELIMIT_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
     SQLALCHEMY_DATABASE_URI = 'sqlite://'
     WTF_CSRF_ENABLED = False
     PAYSTACK_SECRET_KEY = 'test_secret_key'
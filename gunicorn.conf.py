@@ -0,0 +1,37 @@
+"""
+Production gunicorn settings. gunicorn reads ./gunicorn.conf.py by default, so
+`gunicorn run:app` picks this up; every value can be overridden with the usual
+GUNICORN_CMD_ARGS or command-line flags.
+
+The app is imported once in the master (preload_app) and the workers are
+forked from it, so imports, create_app() and template compilation happen once
+and their memory is shared copy-on-write instead of being redone per worker.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# A small fixed default: in containers cpu_count() reports the host's CPUs, and
+# every worker holds its own database pool. Raise it with WEB_CONCURRENCY.
+workers = int(os.environ.get('WEB_CONCURRENCY') or 2)
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+preload_app = True
+# Recycle workers now and then to bound any slow memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+# One cache shared by all workers instead of a copy per worker
+os.environ.setdefault('CACHE_BACKEND', 'sqlite')
+# Compile templates in the master and keep compiled bytecode on disk across deploys
+os.environ.setdefault('JINJA_PRELOAD_TEMPLATES', '1')
+os.environ.setdefault('JINJA_BYTECODE_CACHE_DIR',
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jinja_cache'))
+
+
+def post_fork(server, worker):
+    # Database connections must not be shared across processes; drop any the
+    # master opened so each worker starts its own pool.
+    from run import app
+    from app import db
+    with app.app_context():
+        db.engine.dispose()
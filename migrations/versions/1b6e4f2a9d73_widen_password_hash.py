@@ -0,0 +1,33 @@
+"""widen password hash
+
+Revision ID: 1b6e4f2a9d73
+Revises: f0d5b2e7a361
+Create Date: 2026-10-19 15:52:14.663091
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b6e4f2a9d73'
+down_revision = 'f0d5b2e7a361'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # scrypt and pbkdf2:sha512 hashes do not fit in 128 characters
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=256),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=256),
+               type_=sa.String(length=128),
+               existing_nullable=True)
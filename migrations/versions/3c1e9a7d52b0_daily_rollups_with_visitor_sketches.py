@@ -0,0 +1,44 @@
+"""daily rollups with visitor sketches
+
+Revision ID: 3c1e9a7d52b0
+Revises: fb7170deab93
+Create Date: 2026-10-19 09:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e9a7d52b0'
+down_revision = 'fb7170deab93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('link_daily_stat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('clicks', sa.Integer(), nullable=False),
+    sa.Column('visitors', sa.LargeBinary(), nullable=True),
+    sa.ForeignKeyConstraint(['link_id'], ['link.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('link_id', 'day', name='uq_link_daily_stat_link_day')
+    )
+    op.create_table('profile_daily_stat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.Column('visitors', sa.LargeBinary(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', name='uq_profile_daily_stat_user_day')
+    )
+
+
+def downgrade():
+    op.drop_table('profile_daily_stat')
+    op.drop_table('link_daily_stat')
@@ -0,0 +1,43 @@
+"""user analytics columns
+
+Revision ID: 4e9c7b2d1f80
+Revises: d8b3f5a1c246
+Create Date: 2026-10-19 21:38:16.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e9c7b2d1f80'
+down_revision = 'd8b3f5a1c246'
+branch_labels = None
+depends_on = None
+
+USER_COLUMNS = (
+    sa.Column('profile_views', sa.Integer(), nullable=True),
+    sa.Column('last_login', sa.Date(), nullable=True),
+    sa.Column('login_streak', sa.Integer(), nullable=True),
+)
+
+
+def upgrade():
+    # These were added to the models without a migration, so databases created
+    # with db.create_all() may already have them.
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('user')}
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        for column in USER_COLUMNS:
+            if column.name not in existing:
+                batch_op.add_column(column)
+    # The model no longer maps paystack_plan_code, so plans are inserted without one
+    with op.batch_alter_table('plan', schema=None) as batch_op:
+        batch_op.alter_column('paystack_plan_code', existing_type=sa.String(length=100), nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('plan', schema=None) as batch_op:
+        batch_op.alter_column('paystack_plan_code', existing_type=sa.String(length=100), nullable=False)
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        for column in reversed(USER_COLUMNS):
+            batch_op.drop_column(column.name)
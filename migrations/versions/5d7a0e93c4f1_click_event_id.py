@@ -0,0 +1,28 @@
+"""click event id
+
+Revision ID: 5d7a0e93c4f1
+Revises: 8f42b6c1d0e3
+Create Date: 2026-10-19 11:20:05.318427
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7a0e93c4f1'
+down_revision = '8f42b6c1d0e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('click', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('event_id', sa.String(length=32), nullable=True))
+        batch_op.create_unique_constraint('uq_click_event_id', ['event_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('click', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_click_event_id', type_='unique')
+        batch_op.drop_column('event_id')
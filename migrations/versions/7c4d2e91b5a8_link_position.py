@@ -0,0 +1,31 @@
+"""link position
+
+Revision ID: 7c4d2e91b5a8
+Revises: 1b6e4f2a9d73
+Create Date: 2026-10-19 17:21:37.509412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4d2e91b5a8'
+down_revision = '1b6e4f2a9d73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing links all get position 0, so they keep their newest-first order
+    with op.batch_alter_table('link', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), server_default='0', nullable=False))
+    op.drop_index('ix_link_user_id_timestamp', table_name='link')
+    op.create_index('ix_link_user_id_position_timestamp', 'link', ['user_id', 'position', 'timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_link_user_id_position_timestamp', table_name='link')
+    op.create_index('ix_link_user_id_timestamp', 'link', ['user_id', 'timestamp'], unique=False)
+    with op.batch_alter_table('link', schema=None) as batch_op:
+        batch_op.drop_column('position')
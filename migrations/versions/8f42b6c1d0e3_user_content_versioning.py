@@ -0,0 +1,28 @@
+"""user content versioning
+
+Revision ID: 8f42b6c1d0e3
+Revises: 3c1e9a7d52b0
+Create Date: 2026-10-19 10:03:47.581142
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f42b6c1d0e3'
+down_revision = '3c1e9a7d52b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('stats_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('stats_updated_at')
+        batch_op.drop_column('content_updated_at')
@@ -0,0 +1,34 @@
+"""activity buckets
+
+Revision ID: a9e31f6b7c28
+Revises: 5d7a0e93c4f1
+Create Date: 2026-10-19 12:41:19.072634
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e31f6b7c28'
+down_revision = '5d7a0e93c4f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('activity_bucket',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(length=10), nullable=False),
+    sa.Column('resolution', sa.String(length=5), nullable=False),
+    sa.Column('start', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'metric', 'resolution', 'start', name='uq_activity_bucket_user_metric_resolution_start')
+    )
+
+
+def downgrade():
+    op.drop_table('activity_bucket')
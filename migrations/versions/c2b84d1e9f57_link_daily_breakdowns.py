@@ -0,0 +1,34 @@
+"""link daily breakdowns
+
+Revision ID: c2b84d1e9f57
+Revises: a9e31f6b7c28
+Create Date: 2026-10-19 13:37:52.846203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2b84d1e9f57'
+down_revision = 'a9e31f6b7c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('link_daily_breakdown',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('value', sa.String(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['link.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('link_id', 'day', 'dimension', 'value', name='uq_link_daily_breakdown_link_day_dimension_value')
+    )
+
+
+def downgrade():
+    op.drop_table('link_daily_breakdown')
@@ -0,0 +1,38 @@
+"""activity total baselines
+
+Revision ID: d8b3f5a1c246
+Revises: 7c4d2e91b5a8
+Create Date: 2026-10-19 21:04:52.318207
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b3f5a1c246'
+down_revision = '7c4d2e91b5a8'
+branch_labels = None
+depends_on = None
+
+DAY_SUM = """(SELECT COALESCE(SUM(d.count), 0) FROM activity_bucket d
+              WHERE d.user_id = activity_bucket.user_id AND d.metric = activity_bucket.metric
+                AND d.resolution = 'day')"""
+
+
+def upgrade():
+    # 'total' rows were lifetime counts; lifetime totals are now summed from the
+    # daily buckets, so only what the daily buckets don't cover is kept.
+    op.execute(f"UPDATE activity_bucket SET count = count - {DAY_SUM} WHERE resolution = 'total'")
+    op.execute("DELETE FROM activity_bucket WHERE resolution = 'total' AND count <= 0")
+
+
+def downgrade():
+    op.execute(sa.text(
+        "INSERT INTO activity_bucket (user_id, metric, resolution, start, count) "
+        "SELECT DISTINCT user_id, metric, 'total', :epoch, 0 FROM activity_bucket b "
+        "WHERE resolution = 'day' AND NOT EXISTS (SELECT 1 FROM activity_bucket t "
+        "WHERE t.user_id = b.user_id AND t.metric = b.metric AND t.resolution = 'total')"
+    ).bindparams(sa.bindparam('epoch', datetime(1970, 1, 1), type_=sa.DateTime())))
+    op.execute(f"UPDATE activity_bucket SET count = count + {DAY_SUM} WHERE resolution = 'total'")
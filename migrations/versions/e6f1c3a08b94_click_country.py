@@ -0,0 +1,26 @@
+"""click country
+
+Revision ID: e6f1c3a08b94
+Revises: c2b84d1e9f57
+Create Date: 2026-10-19 14:25:33.910478
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f1c3a08b94'
+down_revision = 'c2b84d1e9f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('click', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('country', sa.String(length=2), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('click', schema=None) as batch_op:
+        batch_op.drop_column('country')
@@ -0,0 +1,47 @@
+"""composite indexes for hot queries
+
+Revision ID: f0d5b2e7a361
+Revises: e6f1c3a08b94
+Create Date: 2026-10-19 15:08:41.227915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0d5b2e7a361'
+down_revision = 'e6f1c3a08b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_click_link_id_timestamp', 'click', ['link_id', 'timestamp'], unique=False)
+    op.create_index('ix_link_user_id_timestamp', 'link', ['user_id', 'timestamp'], unique=False)
+    op.create_index('ix_subscription_user_id_status_end_date', 'subscription', ['user_id', 'status', 'end_date'], unique=False)
+    # No earlier migration creates the payment table; databases set up with
+    # db.create_all() already have it, fresh ones get it here.
+    if not sa.inspect(op.get_bind()).has_table('payment'):
+        op.create_table('payment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('plan_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('reference', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['plan_id'], ['plan.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('reference')
+        )
+    op.create_index('ix_payment_status_created_at', 'payment', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_payment_status_created_at', table_name='payment')
+    op.drop_index('ix_subscription_user_id_status_end_date', table_name='subscription')
+    op.drop_index('ix_link_user_id_timestamp', table_name='link')
+    op.drop_index('ix_click_link_id_timestamp', table_name='click')
@@ -0,0 +1,54 @@
+import pytest
+from app import create_app, db
+from app.analytics import spool
+from app.models import User, Link
+
+
+@pytest.fixture(autouse=True)
+def click_spool(monkeypatch):
+    """A fresh spool writer, so each test's clicks land in its own CLICK_SPOOL_DIR."""
+    writer = spool.ClickSpool()
+    monkeypatch.setattr(spool, 'spool', writer)
+    yield writer
+    if writer.file is not None:
+        writer.file.close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing')
+    app.config.update(
+        CLICK_SPOOL_DIR=str(tmp_path / 'click_spool'),
+        HEAVY_HITTERS_DIR=str(tmp_path / 'heavy_hitters'),
+        GEOIP_DATABASE=str(tmp_path / 'geoip.bin'),
+    )
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def link(user):
+    link = Link(title='Example', url='https://example.com', author=user)
+    db.session.add(link)
+    db.session.commit()
+    return link
+
+
+@pytest.fixture
+def client(app, user):
+    """A test client logged in as `user`."""
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password'})
+    return client
@@ -0,0 +1,23 @@
+import sqlite3
+from app.cache.sqlite import SQLiteBackend
+
+
+def test_version_bump_on_a_locked_file_is_retried(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    backend = SQLiteBackend(path)
+    backend.set('links', 1, 'old')
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute('BEGIN EXCLUSIVE')
+
+    backend.bump_version('links')  # does not raise
+    assert backend.pending_bumps == {'links'}
+    # Other processes may still see the old value, this one does not.
+    assert backend.get('links', 1) is None
+
+    locker.execute('ROLLBACK')
+    backend.retried = 0
+    assert backend.get('links', 1) is None
+    assert backend.pending_bumps == set()
+    assert locker.execute("SELECT version FROM versions WHERE namespace = 'links'").fetchone() == (1,)
+    backend.set('links', 1, 'new')
+    assert backend.get('links', 1) == 'new'
@@ -0,0 +1,74 @@
+import io
+from datetime import datetime
+from app import db
+from app.models import Plan, User, Link, Click, Payment, LinkDailyStat
+from app.analytics import record_click
+from app.data_transfer import export_data, import_data
+
+
+def _export():
+    out = io.StringIO()
+    export_data(out)
+    db.session.rollback()
+    return out.getvalue().splitlines()
+
+
+def _import(lines):
+    inserted, skipped = import_data(lines)
+    db.session.commit()
+    return inserted, skipped
+
+
+def _counts():
+    return {model.__name__: model.query.count() for model in (Plan, User, Link, Click, Payment, LinkDailyStat)}
+
+
+def _fill(user, link):
+    plan = Plan(name='Premium', price=100000)
+    db.session.add(plan)
+    db.session.flush()
+    db.session.add(Payment(user_id=user.id, plan_id=plan.id, amount=100000, status='success', reference='ref-1'))
+    for i in range(3):
+        record_click(link, ip_address=f'10.0.0.{i}', timestamp=datetime(2024, 1, 1, i), event_id=f'event{i}')
+    db.session.commit()
+
+
+def test_import_round_trip_into_an_empty_database(link, user):
+    _fill(user, link)
+    lines, before = _export(), _counts()
+    db.drop_all()
+    db.create_all()
+
+    _import(lines)
+
+    assert _counts() == before
+    imported = Link.query.one()
+    assert imported.author.username == 'alice'
+    assert imported.clicks.count() == 3
+
+
+def test_importing_twice_skips_everything(link, user):
+    _fill(user, link)
+    lines, before = _export(), _counts()
+
+    inserted, skipped = _import(lines)
+
+    assert sum(inserted.values()) == 0
+    assert skipped['user'] == 1 and skipped['plan'] == 1
+    assert _counts() == before
+
+
+def test_import_skips_clicks_and_payments_already_present(link, user):
+    _fill(user, link)
+    lines = _export()
+    # The same account under another email, e.g. exported before an email change
+    user.email = 'alice@example.org'
+    user.username = 'alice2'
+    db.session.commit()
+
+    inserted, skipped = _import(lines)
+
+    assert inserted['user'] == 1
+    assert (inserted['click'], skipped['click']) == (0, 3)
+    assert (inserted['payment'], skipped['payment']) == (0, 1)
+    assert Click.query.count() == 3
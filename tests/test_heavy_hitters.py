@@ -0,0 +1,41 @@
+import json
+import os
+import time
+from app.analytics import heavy_hitters
+from app.analytics.heavy_hitters import SpaceSaving, top
+
+
+def _write_snapshot(directory, name, kind, window, key, count, age):
+    """A snapshot from another (possibly exited) worker, last published `age` seconds ago."""
+    now = time.time()
+    length, _ = heavy_hitters.WINDOWS[window]
+    start = int(now - age) - int(now - age) % length
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        json.dump({f'{kind}:{window}': {str(start): {key: [count, 0]}}}, f)
+    os.utime(path, (now - age, now - age))
+    return path
+
+
+def test_space_saving_keeps_heavy_keys():
+    summary = SpaceSaving(capacity=3)
+    for key in 'aaaaabbbcd' + 'a' * 5:
+        summary.add(key)
+    assert summary.top(1) == [('a', 10, 0)]
+
+
+def test_hour_query_keeps_snapshots_the_day_window_needs(app):
+    directory = app.config['HEAVY_HITTERS_DIR']
+    path = _write_snapshot(directory, 'old-worker.json', 'link', 'day', '42', 500, age=2 * 3600)
+    assert top('link', 'day') == [('42', 500, 0)]
+    assert top('link', 'hour') == []
+    assert os.path.exists(path)
+    assert top('link', 'day') == [('42', 500, 0)]
+
+
+def test_snapshots_older_than_every_window_are_removed(app):
+    directory = app.config['HEAVY_HITTERS_DIR']
+    path = _write_snapshot(directory, 'gone-worker.json', 'link', 'day', '7', 5, age=2 * 86400)
+    assert top('link', 'hour') == []
+    assert not os.path.exists(path)
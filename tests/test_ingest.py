@@ -0,0 +1,34 @@
+from app import db
+from app.models import LinkDailyStat, ProfileDailyStat
+from app.analytics import record_click, record_profile_view
+from app.analytics.reports import link_breakdowns, link_unique_visitors, profile_unique_visitors
+
+
+def test_click_rollup_counts_every_click_and_each_visitor_once(link):
+    for ip_address in ('10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.1'):
+        record_click(link, ip_address=ip_address)
+        db.session.commit()
+
+    stat = LinkDailyStat.query.filter_by(link_id=link.id).one()
+    assert stat.clicks == 4
+    assert link_unique_visitors([link.id]) == {link.id: 2}
+
+
+def test_profile_view_rollup_counts_every_view_and_each_visitor_once(user):
+    for ip_address in ('10.0.0.1', '10.0.0.1', '10.0.0.3'):
+        record_profile_view(user, ip_address=ip_address)
+    db.session.commit()
+
+    assert ProfileDailyStat.query.filter_by(user_id=user.id).one().views == 3
+    assert profile_unique_visitors(user) == 2
+
+
+def test_click_breakdowns_count_each_dimension(link):
+    for referrer in ('https://instagram.com/p/1', 'https://instagram.com/p/2', None):
+        record_click(link, ip_address='10.0.0.1', user_agent='Mozilla/5.0 (iPhone)', referrer=referrer)
+    db.session.commit()
+
+    breakdowns = link_breakdowns([link.id])
+    assert breakdowns['referrer'] == [('instagram.com', 2), ('direct', 1)]
+    assert breakdowns['country'] == [('Unknown', 3)]
+    assert sum(clicks for _, clicks in breakdowns['device']) == 3
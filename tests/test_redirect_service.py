@@ -0,0 +1,26 @@
+from app.analytics.spool import read_segment, segments, spool_dir
+from app.redirect_service import RedirectService, _Profile
+from app.redirects import LinkTarget
+
+
+def _scope(ip_address):
+    return {'type': 'http', 'headers': [(b'user-agent', b'Mozilla/5.0')], 'client': (ip_address, 1234)}
+
+
+def test_queue_is_bounded_and_overflow_clicks_are_spooled(tmp_path):
+    service = RedirectService('testing')
+    service.flask_app.config['CLICK_SPOOL_DIR'] = str(tmp_path / 'click_spool')
+    service.max_pending = 2
+    target = LinkTarget(1, 1, 'https://example.com')
+
+    for i in range(4):
+        service._queue('click', target, _scope(f'10.0.0.{i}'))
+    service._queue('view', _Profile(1), _scope('10.0.0.9'))
+
+    assert [event[2] for event in service.pending] == ['10.0.0.0', '10.0.0.1']
+    assert service.backlog == 2
+    assert service.dropped_views == 1
+    with service.flask_app.app_context():
+        spooled = [record for path, _ in segments(spool_dir()) for record in read_segment(path)]
+    assert [(record['link_id'], record['ip_address']) for record in spooled] == [(1, '10.0.0.2'), (1, '10.0.0.3')]
+    service.executor.shutdown()
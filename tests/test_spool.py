@@ -0,0 +1,27 @@
+from datetime import datetime
+from app.models import Click, LinkDailyStat
+from app.analytics import timeseries
+from app.analytics.ingest import replay_spool
+from app.analytics.spool import spool_click
+
+
+def test_replaying_the_spool_twice_loads_each_click_once(link, user, click_spool):
+    for i in range(3):
+        spool_click(link, datetime(2024, 1, 1, i), ip_address=f'10.0.0.{i}', referrer='https://example.org/')
+
+    # The segment is still open (this process is its writer), so it is kept and replayed again.
+    assert replay_spool() == (3, 0)
+    assert replay_spool() == (0, 3)
+
+    assert Click.query.count() == 3
+    assert LinkDailyStat.query.filter_by(link_id=link.id).one().clicks == 3
+    assert timeseries.total(user.id, 'clicks') == 3
+
+
+def test_replay_removes_finished_segments(link, click_spool):
+    spool_click(link, datetime(2024, 1, 1))
+    click_spool._rotate()
+
+    assert replay_spool() == (1, 0)
+    assert replay_spool() == (0, 0)
+    assert Click.query.count() == 1
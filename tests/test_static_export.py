@@ -0,0 +1,19 @@
+import os
+from app.static_export import export_profiles
+
+
+def test_export_counts_only_profiles_written(app, user, tmp_path):
+    out_dir = tmp_path / 'site'
+    out_dir.mkdir()
+    assert export_profiles(str(out_dir), workers=1) == (1, 0)
+    assert (out_dir / 'alice' / 'index.html').exists()
+
+
+def test_export_does_not_count_profiles_it_refuses_to_write(app, user, tmp_path):
+    out_dir, elsewhere = tmp_path / 'site', tmp_path / 'elsewhere'
+    out_dir.mkdir()
+    elsewhere.mkdir()
+    os.symlink(elsewhere, out_dir / 'alice')
+
+    assert export_profiles(str(out_dir), workers=1) == (0, 0)
+    assert not (elsewhere / 'index.html').exists()
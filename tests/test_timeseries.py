@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import ActivityBucket
+from app.analytics import timeseries
+
+
+def _bump(user, at, amount=1):
+    timeseries.bump(user.id, 'clicks', at, amount=amount)
+    db.session.commit()
+
+
+def test_series_bins_existing_rows(app, user):
+    _bump(user, datetime(2024, 1, 1, 5))
+    _bump(user, datetime(2024, 1, 3, 12), amount=2)
+    interval, size, points = timeseries.series(user.id, 'clicks', 'day', datetime(2024, 1, 1), datetime(2024, 1, 5))
+    assert (interval, size) == ('day', 1)
+    assert points == [(datetime(2024, 1, d), count) for d, count in ((1, 1), (2, 0), (3, 2), (4, 0))]
+
+
+def test_series_downsamples_to_max_points(app, user):
+    _bump(user, datetime(2022, 1, 1))
+    _bump(user, datetime(2024, 12, 30))
+    start, end = datetime(2022, 1, 1), datetime(2025, 1, 1)
+    interval, size, points = timeseries.series(user.id, 'clicks', 'day', start, end)
+    assert len(points) <= timeseries.MAX_POINTS
+    assert size == -(-(end - start).days // timeseries.MAX_POINTS)
+    assert points[0] == (start, 1)
+    assert sum(count for _, count in points) == 2
+    assert points[1][0] == start + timedelta(days=size)
+
+
+def test_bump_upserts_hour_and_day_buckets_only(app, user):
+    _bump(user, datetime(2024, 1, 1, 5))
+    _bump(user, datetime(2024, 1, 1, 5, 30), amount=2)
+    _bump(user, datetime(2024, 1, 2, 9))
+    buckets = {(b.resolution, b.start): b.count for b in ActivityBucket.query.filter_by(user_id=user.id)}
+    assert buckets == {('hour', datetime(2024, 1, 1, 5)): 3, ('day', datetime(2024, 1, 1)): 3,
+                       ('hour', datetime(2024, 1, 2, 9)): 1, ('day', datetime(2024, 1, 2)): 1}
+
+
+def test_total_sums_daily_buckets_and_baseline(app, user):
+    user.profile_views = 10
+    db.session.commit()
+    timeseries.backfill()
+    timeseries.bump(user.id, 'views', datetime(2024, 1, 1))
+    timeseries.bump(user.id, 'views', datetime(2024, 2, 1))
+    _bump(user, datetime(2024, 1, 1))
+    assert timeseries.total(user.id, 'views') == 12
+    assert timeseries.total(user.id, 'clicks') == 1
+    assert timeseries.total(user.id, 'links') == 0
+
+
+def test_hourly_range_over_limit_is_read_by_day(app, user):
+    interval, size, points = timeseries.series(user.id, 'clicks', 'hour', datetime(2024, 1, 1), datetime(2024, 3, 1))
+    assert interval == 'day'
+    assert len(points) == 60
+
+
+def test_monthly_series_up_to_the_last_representable_month(app, user):
+    _bump(user, datetime(9999, 12, 5))
+    interval, size, points = timeseries.series(user.id, 'clicks', 'month', datetime(9999, 1, 1),
+                                               datetime(9999, 12, 31))
+    assert points[-1] == (datetime(9999, 12, 1), 1)
+    assert len(points) == 12
+
+
+def test_series_rejects_ranges_over_the_limit(app, user):
+    with pytest.raises(ValueError):
+        timeseries.series(user.id, 'clicks', 'day', datetime(2000, 1, 1), datetime(2010, 1, 1))
+
+
+@pytest.mark.parametrize('query', [
+    'start=0001-01-01&end=9999-12-31',
+    'start=1000-01-01&end=3000-01-01&interval=day',
+    'start=0001-01-01T00:00:00%2B01:00&end=0001-01-02',
+    'end=0001-01-05',
+    'start=2024-02-01&end=2024-01-01',
+    'start=yesterday',
+])
+def test_endpoint_rejects_bad_ranges(client, query):
+    assert client.get('/stats/timeseries?' + query).status_code == 400
+
+
+def test_endpoint_monthly_series_at_the_end_of_the_calendar(client):
+    response = client.get('/stats/timeseries?start=9999-01-01&end=9999-12-31T23:00:00&interval=month')
+    assert response.status_code == 200
+    assert len(response.get_json()['series']['clicks']) == 12
+
+
+def test_endpoint_accepts_offsets_and_reports_interval(client):
+    response = client.get('/stats/timeseries?start=2024-01-01T00:00:00%2B00:00'
+                          '&end=2024-03-01T00:00:00%2B02:00&interval=hour&metrics=clicks')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['interval'], data['requested_interval'], data['buckets_per_point']) == ('day', 'hour', 1)
+    assert data['end'] == '2024-02-29T22:00:00'